@@ -6,30 +6,47 @@ Surgery, surgery
 
 from __future__ import annotations
 
-import datetime
 import logging
-from enum import IntEnum, auto
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
 from io import TextIOWrapper
 from pathlib import Path
-from struct import pack
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, cast
 
 from allslain.args import Args
-from allslain.colorize import Color
 from allslain.config import load_config, load_config_runtime
 from allslain.config import save_config as _save_config
 from allslain.data_providers.starcitizen_api import Mode
 from allslain.handlers.handler import Handler
-from allslain.handlers.killp import KillP
-from allslain.handlers.killv import KillV
 from allslain.log_parser import LogParser
-from psutil import process_iter
 from PyQt6.QtCore import QThread
 from PyQt6.QtCore import pyqtSignal as Signal
 from tomlkit import TOMLDocument
 
+from .cache import LookupCache
+from .checkpoint import (
+    CHECKPOINT_INTERVAL,
+    STATE_FIELDS,
+    Checkpoint,
+    file_head,
+    load_checkpoint,
+    resume_offset,
+    save_checkpoint,
+)
 from .config import ConfigDocument as GuiConfig
-from .discord import post_webhook
+from .follow import LogFollower
+from .hedge import HedgedLookup, load_providers
+from .lookup import AsyncLookup, PendingEvent
+from .prefetch import Prefetcher
+from .process import ProcessWatcher
+from .render import Event
+from .routing import Router
+from .snapshot import SnapshotProvider
+from .timestamps import LocalTime
+from .tracing import Tracer
 
 
 if TYPE_CHECKING:
@@ -63,69 +80,24 @@ def save_config(config: ConfigDocument) -> None:
     _save_config(cast(TOMLDocument, config))
 
 
-COLOR_MAP = {
-    "BLACK": "#0C0C0C",
-    "RED": "#C50F1F",
-    "GREEN": "#13A10D",
-    "YELLOW": "#C19C00",
-    "BLUE": "#0037DA",
-    "MAGENTA": "#881798",
-    "CYAN": "#3A96DD",
-    "WHITE": "#CCCCCC",
-}
-
-COLOR_MAP_BOLD = {
-    "BLACK": "#767676",
-    "RED": "#E74856",
-    "GREEN": "#16C60C",
-    "YELLOW": "#E6E600",
-    "BLUE": "#3B78FF",
-    "MAGENTA": "#B4009E",
-    "CYAN": "#61D6D6",
-    "WHITE": "#F2F2F2",
-}
-
-
 GAME_EXE = "StarCitizen.exe" if not __debug__ else "mpv.exe"
 
+# Milliseconds to wait for the webhook dispatcher when stopping
+WEBHOOK_STOP_TIMEOUT = 6000
 
-def color2__call__(
-    self: Color, text: object, bold: bool = False, bg=None, bg_bold: bool = False
-) -> str:
-    name = COLOR_MAP_BOLD[self.name] if bold else COLOR_MAP[self.name]
-    return f'<span style="color: {name}">{str(text).replace(" ", "&nbsp;")}</span>'
-
-
-def color2_rgb(
-    fg: tuple[int, int, int] | None = None,
-    bg: tuple[int, int, int] | None = None,
-    bold: bool = False,
-    text: str = "",
-) -> str:
-    if not fg:
-        return ""
-    return f'<span style="color: #{pack("BBB", *fg).hex()}">{text.replace(" ", "&nbsp;")}</span>'
-
-
-color_call_orig = Color.__call__
-color_rgb_orig = Color.rgb
+# Seconds a webhook event waits for its lookups, so it's sent with the orgs
+WEBHOOK_LOOKUP_WAIT = 5.0
 
 
-class OutputType(IntEnum):
-    ANSI = auto()
-    HTML = auto()
+def handler_classes(cls: type[Handler] = Handler) -> Iterator[type[Handler]]:
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from handler_classes(subclass)
 
-    def __call__(self):
-        match self:
-            case OutputType.ANSI:
-                Color.__call__ = color_call_orig
-                Color.rgb = color_rgb_orig
-            case OutputType.HTML:
-                Color.__call__ = color2__call__
-                Color.rgb = color2_rgb
 
-
-OutputType.HTML()
+def find_lookup(log_parser: LogParser) -> Callable[..., Any] | None:
+    provider = getattr(log_parser.state, "data_provider", None)
+    return getattr(provider, "lookup_player", None)
 
 
 logger = logging.getLogger("all-slain-gui").getChild("all-slain")
@@ -133,120 +105,316 @@ logger = logging.getLogger("all-slain-gui").getChild("all-slain")
 
 class AllSlain(QThread):
     output = Signal(object)
+    # Event, or (index, Event) like output
+    event_output = Signal(object)
     game_exit = Signal()
 
-    def __init__(_self, gui_args: GuiArgs, gui_config: GuiConfig):
+    def __init__(
+        _self, gui_args: GuiArgs, gui_config: GuiConfig, replay: str | None = None
+    ):
+        """
+        `replay` is a Game.log to read once from the start, instead of waiting
+        for the game and following its log. Checkpoints and webhooks are skipped.
+        """
         super().__init__()
         _self.setObjectName("AllSlain")
         _self._initialized = False
+        _self.replay = replay
         _self._stopping = False
+        _self.game = ProcessWatcher(GAME_EXE)
+        _self.auto_exit = gui_args.auto_exit
+        _self.follower: LogFollower | None = None
+        _self.log_state = None
+        _self._checkpoint_saved = time.monotonic()
+        _self._checkpoint_position = 0
+        _self._checkpoint_identity = (0, 0)
+        _self._checkpoint_head = ""
+        _self.local_time = LocalTime()
+        _self.lookup: AsyncLookup | None = None
+        _self.hedged: HedgedLookup | None = None
+        # Handler and data of the event being handled
+        _self.current: tuple[Handler, Any] | None = None
+        # Lines output so far, not counting in place updates. Indexes count back
+        # through these, the overlay maps them past lines from elsewhere.
+        _self.lines_output = 0
+        # Player name -> events waiting for its lookup
+        _self.pending: dict[str, list[PendingEvent]] = {}
+        # Pending events held back from webhooks, by when they're sent anyway
+        _self.held: deque[PendingEvent] = deque()
+        _self.tracer = Tracer()
+        # Handler name -> events output
+        _self.events: Counter[str] = Counter()
+        # For metrics and profiling
+        _self.native_id = 0
+        _self.thread_ident = 0
+        _self.cpu_time = 0.0
 
         def handler_output(self: Handler, data: str | tuple[int, str]):
-            dt_local = (
-                datetime.datetime.strptime(
-                    self.state.curr_event_timestr, "%Y-%m-%d %H:%M:%S"
-                )
-                .replace(tzinfo=datetime.timezone.utc)
-                .astimezone()
-            ).strftime("%Y-%m-%d %H:%M:%S")
+            dt_local = _self.local_time.localize(self.state.curr_event_timestr)
+            prefix = f"{dt_local}{self.header_text}: "
 
             if isinstance(data, tuple):
-                _self.output.emit((data[0], f"{dt_local}{self.header_text}: {data[1]}"))
+                event = Event(type(self).__name__, f"{prefix}{data[1]}")
+                _self.emit(event, data[0])
+                if data[0] >= 0:
+                    _self.lines_output += 1
             else:
-                _self.output.emit(f"{dt_local}{self.header_text}: {data}")
+                event = Event(type(self).__name__, f"{prefix}{data}")
+                _self.emit(event)
+                _self.lines_output += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(event.plain)
+
+            text = data[1] if isinstance(data, tuple) else data
+            # In place updates were sent as the line they update. Whether it's
+            # recent is decided now, by the event's time, even if it's held.
+            route = (
+                event.type in _self.routed
+                and (not isinstance(data, tuple) or data[0] >= 0)
+                # 2sec in either direction, 4s window
+                and abs(_self.local_time.age(self.state.curr_event_timestr)) < 2
+            )
+
+            if _self.lookup is not None:
+                if (missed := _self.lookup.take_missed()) and _self.current:
+                    pending = PendingEvent(
+                        *_self.current, prefix, _self.lines_output, set(missed)
+                    )
+                    for name in pending.names:
+                        _self.pending.setdefault(name, []).append(pending)
+                    if route:
+                        # Sent with the orgs once the lookups finish
+                        pending.hold(
+                            text,
+                            self.state.player_name,
+                            time.monotonic() + WEBHOOK_LOOKUP_WAIT,
+                        )
+                        _self.held.append(pending)
+                        route = False
+            if route:
+                _self.router.dispatch(Event(event.type, text), self.state.player_name)
+            if _self.lookup is not None:
+                _self.apply_lookups()
 
         Handler.output = handler_output
 
         def logparser_follow(self: LogParser, f: TextIOWrapper):
-            if gui_args.auto_exit:
-                check_running_counter = 0
-                while not _self._stopping:
-                    if line := f.readline():
-                        yield line.rstrip(self.LOG_NEWLINE)
+            _self.log_state = self.state
+            checkpoint = load_checkpoint() if _self.replay is None else None
+            if start := resume_offset(checkpoint, f.name):
+                logger.debug(f"resuming {f.name} from {start}")
+                for name, value in cast(Checkpoint, checkpoint)["state"].items():
+                    if name in STATE_FIELDS and value is not None:
+                        setattr(self.state, name, value)
+
+            if _self.snapshot:
+                try:
+                    self.state.data_provider = SnapshotProvider()
+                except sqlite3.Error as e:
+                    logger.warning(f"offline snapshot unavailable: {e}")
+            elif lookup := find_lookup(self):
+                provider = _self.args.data_provider.provider
+                if gui_args.lookup_auto:
+                    lookups = load_providers(_self.args, provider, lookup)
+                    if len(lookups) > 1:
+                        _self.hedged = HedgedLookup(lookups)
+                        lookup, provider = _self.hedged, "auto"
                     else:
-                        _self.msleep(1000)
-                        if check_running_counter > 5:
-                            if _self.get_game_proc() is None:
-                                break
-                            check_running_counter = 0
-                        check_running_counter += 1
+                        logger.info("only one data provider, not hedging")
+                try:
+                    cache = LookupCache(provider)
+                except sqlite3.Error as e:
+                    logger.warning(f"lookup cache unavailable: {e}")
+                    cache = None
+                _self.lookup = AsyncLookup(lookup, cache)
+                self.state.data_provider.lookup_player = _self.lookup
             else:
-                while not _self._stopping:
-                    if line := f.readline():
-                        yield line.rstrip(self.LOG_NEWLINE)
-                    else:
-                        _self.msleep(1000)
+                logger.debug("no data provider lookup to make asynchronous")
+
+            _self.follower = LogFollower(
+                f,
+                self.LOG_NEWLINE,
+                lambda: _self._stopping,
+                _self.on_idle,
+                chunked=gui_args.log_reader == "chunked",
+                start=start,
+                stop_at_eof=_self.replay is not None,
+            )
+            lines: Iterable[str] = _self.follower
+            if _self.lookup is not None:
+                follower = _self.follower
+                lines = Prefetcher(
+                    _self.lookup,
+                    # Not while reading the backlog
+                    lambda: _self.args.player_lookup and follower.written_ns != 0,
+                ).scan(lines)
+            try:
+                yield from lines
+            finally:
+                if _self.replay is None:
+                    _self.save_checkpoint(force=True)
+                _self.follower.close()
+                if _self.lookup is not None:
+                    _self.lookup.close()
 
         LogParser.follow = logparser_follow
 
         _self.args = cast(Args, load_config_runtime(gui_args))
-        _self.args.file = None
+        _self.args.file = _self.replay
         _self.args.replay = False
+        if _self.replay is not None:
+            _self._initialized = True
 
-        _self.config = cast(ConfigDocument, load_config())
+        # allslain doesn't know the snapshot, it's set up as its data provider
+        # once the log parser is
+        _self.snapshot = gui_args.lookup_snapshot
+        if _self.snapshot:
+            _self.args.data_provider.provider = ""
 
-        if (
-            gui_config["discord"]["webhook1_enabled"]
-            and gui_config["discord"]["webhook1_info"]["url"]
-            and gui_config["discord"]["webhook1_info"].get("name") is not None
-        ):
-
-            def handler_call_discord(self: Handler, data):
-                if text := self.format(data):
-                    self.output(text)
-                self.after(data)
-
-                time_delta = abs(
-                    (
-                        datetime.datetime.now()
-                        - datetime.datetime.fromisoformat(self.state.curr_event_timestr)
-                    ).total_seconds()
-                )
-                if (
-                    text
-                    and self.state.player_name
-                    and self.state.player_name in text
-                    and time_delta < 2  # 2sec in either direction, 4s window
-                ):
-                    OutputType.ANSI()  # 😵‍💫
-                    ansi_text = self.format(data)
-                    OutputType.HTML()
-
-                    if ansi_text:
-                        post_webhook(
-                            gui_config["discord"]["webhook1_info"]["url"],
-                            cast(str, ansi_text),
-                        )
+        _self.config = cast(ConfigDocument, load_config())
 
-            KillP.__call__ = handler_call_discord
-            KillV.__call__ = handler_call_discord
+        _self.router = Router(gui_config)
+        if _self.replay is not None:
+            _self.router.destinations.clear()
+        # Handlers whose events some webhook takes
+        _self.routed = _self.router.events if _self.router.destinations else frozenset()
+
+        def handler_call_current(call):
+            # Unwrap the previous instance's, after a restart
+            call = getattr(call, "__wrapped__", call)
+
+            @wraps(call)
+            def __call__(self: Handler, data):
+                # A subclass calling its parent's is wrapped twice, the outer
+                # call outputs after the inner one returns
+                previous = _self.current
+                _self.current = (self, data)
+                try:
+                    return call(self, data)
+                finally:
+                    _self.current = previous
+
+            return __call__
+
+        for handler in (Handler, *handler_classes()):
+            if call := vars(handler).get("__call__"):
+                handler.__call__ = handler_call_current(call)
 
     def stopping(self):
         self._stopping = True
 
-    def get_game_proc(self):
-        return next(
-            (
-                proc
-                for proc in process_iter(attrs=["name", "exe"])
-                if proc.info["name"] == GAME_EXE
-            ),
-            None,
+    def on_idle(self) -> bool:
+        if self.lookup is not None:
+            self.apply_lookups()
+        self.save_checkpoint()
+        return not self.auto_exit or self.is_game_running()
+
+    def emit(self, event: Event, index: int | None = None) -> None:
+        self.events[event.type] += 1
+        if self.tracer.enabled and (follower := self.follower) is not None:
+            self.tracer.output(follower.written_ns, follower.read_ns)
+        if index is None:
+            self.output.emit(event.html)
+            self.event_output.emit(event)
+        else:
+            self.output.emit((index, event.html))
+            self.event_output.emit((index, event))
+
+    def apply_lookups(self) -> None:
+        """
+        Formats events again whose lookups have all finished, and replaces their
+        lines.
+        """
+        assert self.lookup is not None
+        for name in self.lookup.take_ready():
+            for pending in self.pending.pop(name, ()):
+                pending.names.discard(name)
+                if pending.names:
+                    continue
+                text = pending.handler.format(pending.data)
+                if isinstance(text, tuple):
+                    text = text[1]
+                if pending.dispatch_by:
+                    self.dispatch_held(pending, text or pending.text)
+                if not text:
+                    continue
+                index = pending.line - self.lines_output - 1
+                event = Event(type(pending.handler).__name__, f"{pending.prefix}{text}")
+                self.emit(event, index)
+        # Nothing is waiting on lookups made while formatting again
+        self.lookup.take_missed()
+        self.release_held()
+
+    def dispatch_held(self, pending: PendingEvent, text: str) -> None:
+        pending.dispatch_by = 0.0
+        self.router.dispatch(
+            Event(type(pending.handler).__name__, text), pending.player_name
         )
 
-    def wait_game(self):
-        while not self._stopping:
-            proc = self.get_game_proc()
-            if proc is None:
-                self.msleep(1000)
-                continue
+    def release_held(self, force: bool = False) -> None:
+        """
+        Sends the held events whose lookups are taking too long as they were
+        first output, or all of them if `force`.
+        """
+        now = time.monotonic()
+        held = self.held
+        while held and (force or held[0].dispatch_by <= now):
+            pending = held.popleft()
+            # 0 once sent
+            if pending.dispatch_by:
+                self.dispatch_held(pending, pending.text)
+
+    def save_checkpoint(self, force: bool = False) -> None:
+        follower = self.follower
+        if follower is None or follower.position == self._checkpoint_position:
+            return
+        now = time.monotonic()
+        if not force and now - self._checkpoint_saved < CHECKPOINT_INTERVAL:
+            return
+        try:
+            if follower.identity != self._checkpoint_identity:
+                self._checkpoint_head = file_head(follower.path)
+                self._checkpoint_identity = follower.identity
+            save_checkpoint(
+                {
+                    "dev": follower.identity[0],
+                    "ino": follower.identity[1],
+                    "head": self._checkpoint_head,
+                    "offset": follower.position,
+                    "state": {
+                        name: getattr(self.log_state, name, None)
+                        for name in STATE_FIELDS
+                    },
+                }
+            )
+        except OSError as e:
+            logger.warning(f"failed to save checkpoint: {e}")
+            return
+        self._checkpoint_saved = now
+        self._checkpoint_position = follower.position
+
+    def is_game_running(self) -> bool:
+        return self.game.running
 
-            self.args.file = str(Path(Path(proc.info["exe"]).parent.parent, "Game.log"))
-            break
+    def wait_game(self):
+        if self.game.wait_started(
+            lambda: self._stopping, lambda seconds: self.msleep(int(seconds * 1000))
+        ):
+            self.args.file = str(
+                Path(cast(str, self.game.exe)).parent.parent / "Game.log"
+            )
 
         self._initialized = True
 
     def run(self):
+        self.native_id = threading.get_native_id()
+        self.thread_ident = threading.get_ident()
+        try:
+            self.run_allslain()
+        finally:
+            self.cpu_time = time.thread_time()
+
+    def run_allslain(self):
         if not self._initialized:
             logger.debug("waiting for game")
             self.wait_game()
@@ -254,7 +422,13 @@ class AllSlain(QThread):
             logger.debug("quit before game start")
             return
         logger.debug("game started")
-        with LogParser(self.args) as log_parser:
-            log_parser.run()
+        self.router.start()
+        try:
+            with LogParser(self.args) as log_parser:
+                log_parser.run()
+        finally:
+            self.release_held(force=True)
+            # Let in-flight messages finish
+            self.router.stop(WEBHOOK_STOP_TIMEOUT)
         logger.debug("allslain done")
         self.game_exit.emit()
@@ -1,21 +1,62 @@
+import logging
+import threading
+from typing import cast
+
 from PyQt6.QtWidgets import QApplication
 
 from .allslain_patch import AllSlain
 from .args import parse_args
 from .config import load_config, load_config_runtime
+from .profiling import SamplingProfiler
 from .windows.main import MainWindow
 
 
+logger = logging.getLogger("all-slain-gui").getChild("app")
+
+
 class App(QApplication):
     def __init__(self, argv: list[str]):
         super().__init__(argv)
         self.config = load_config()
         self.args = parse_args(namespace=load_config_runtime())
         self.allslain = AllSlain(self.args, self.config)
+        if self.args.trace is not None:
+            self.allslain.tracer.enable(True)
         self.main_window = MainWindow(self)
         self.aboutToQuit.connect(self.allslain.stopping)
+        if self.args.trace:
+            self.aboutToQuit.connect(self.save_trace)
+        self.profiler = SamplingProfiler(self.profiled_threads)
+        if self.args.profile:
+            self.profiler.start()
+        self.aboutToQuit.connect(self.stop_profiler)
         self.allslain.game_exit.connect(self.quit)
 
+    def profiled_threads(self) -> dict[int, str]:
+        threads = {threading.main_thread().ident or 0: "main"}
+        if ident := self.allslain.thread_ident:
+            threads[ident] = "AllSlain"
+        return threads
+
+    def stop_profiler(self) -> list[str]:
+        """
+        Returns the files the profile was saved to.
+        """
+        if not self.profiler.running:
+            return []
+        self.profiler.stop()
+        try:
+            return self.profiler.save()
+        except OSError as e:
+            logger.warning(f"failed to save profile: {e}")
+            return []
+
+    def save_trace(self) -> None:
+        try:
+            self.allslain.tracer.dump(cast(str, self.args.trace))
+        except OSError as e:
+            logger.warning(f"failed to save latency trace: {e}")
+
     def exec_(self) -> int:
         self.allslain.start()
         s = App.exec()
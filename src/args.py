@@ -9,6 +9,8 @@ from .config import Config
 
 class Args(Config):
     debug: bool
+    trace: str | None
+    profile: bool
 
 
 logging.basicConfig(format="%(asctime)s:%(levelname)s:%(name)s:%(message)s")
@@ -25,6 +27,18 @@ def parse_args(namespace) -> Args:
     )
     parser.add_argument("-d", "--debug", action="store_true")
     parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="trace event latency, and save it to FILE as JSON on exit",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile the GUI and log reader threads, saved to profiles/ on exit",
+    )
 
     args = cast(Args, parser.parse_args(namespace=namespace))
 
@@ -0,0 +1,404 @@
+"""
+
+Benchmarks
+
+    python -m src.benchmark follow Game.log --repeat 100
+    python -m src.benchmark render Game.log
+    python -m src.benchmark timestamps --count 1000000
+    python -m src.benchmark overlay --events 1000
+    python -m src.benchmark replay Game.log --repeat 10
+
+"""
+
+from __future__ import annotations
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator, cast
+
+from .follow import LogFollower
+
+
+def report(name: str, count: int, unit: str, seconds: float) -> None:
+    print(f"{name:>16}: {count / seconds:>14,.0f} {unit}/s ({seconds:.3f}s)")
+
+
+@contextmanager
+def repeated_file(path: str, repeat: int) -> Iterator[str]:
+    """
+    Concatenates `path` `repeat` times into a temporary file, to get a large log from a small one.
+    """
+    if repeat <= 1:
+        yield path
+        return
+    fd, tmp = tempfile.mkstemp(prefix="allslain_bench_", suffix=".log")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for _ in range(repeat):
+                with open(path, "rb") as src:
+                    shutil.copyfileobj(src, out)
+        yield tmp
+    finally:
+        os.remove(tmp)
+
+
+def bench_follow(args: Namespace) -> None:
+    with repeated_file(args.file, args.repeat) as path:
+        print(f"{path}: {os.path.getsize(path) / 1e6:,.0f} MB")
+        for name, chunked in (("readline", False), ("chunked", True)):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                follower = LogFollower(
+                    f, "\n", lambda: False, chunked=chunked, stop_at_eof=True
+                )
+                start = time.perf_counter()
+                count = sum(1 for _ in follower)
+                report(name, count, "lines", time.perf_counter() - start)
+                follower.close()
+
+
+def record_events(path: str) -> list[str]:
+    """
+    Runs all-slain over a log, returning what its handlers output, marked up for rendering.
+    """
+    from allslain.config import load_config_runtime
+    from allslain.handlers.handler import Handler
+    from allslain.log_parser import LogParser
+
+    from . import render  # pylint: disable=unused-import # noqa: F401
+
+    events: list[str] = []
+
+    def handler_output(self, data: str | tuple[int, str]):
+        events.append(data[1] if isinstance(data, tuple) else data)
+
+    def logparser_follow(self: LogParser, f):
+        yield from LogFollower(f, self.LOG_NEWLINE, lambda: False, stop_at_eof=True)
+
+    Handler.output = handler_output
+    LogParser.follow = logparser_follow
+
+    args = load_config_runtime(Namespace())
+    args.file = path
+    args.replay = False
+    args.player_lookup = False
+    with LogParser(args) as log_parser:
+        log_parser.run()
+    return events
+
+
+def bench_render(args: Namespace) -> None:
+    from .render import (
+        Segment,
+        SegmentType,
+        html_cache_stats,
+        html_span,
+        parse,
+        render_html,
+    )
+
+    html_span_uncached = html_span.__wrapped__  # type: ignore[attr-defined]
+
+    def render_html_orig(segment: Segment) -> str:
+        if segment.type == SegmentType.TEXT:
+            return segment.text
+        return html_span_uncached(segment.color, segment.bold, segment.text)
+
+    events = record_events(args.file)
+    segments = [parse(event) for event in events] * args.repeat
+    print(f"{len(segments):,} events, {sum(map(len, segments)):,} fragments")
+
+    for name, renderer in (("uncached", render_html_orig), ("cached", render_html)):
+        start = time.perf_counter()
+        for event in segments:
+            "".join(renderer(segment) for segment in event)
+        report(name, len(segments), "events", time.perf_counter() - start)
+    print(f"cache: {html_cache_stats()}")
+
+
+def bench_timestamps(args: Namespace) -> None:
+    from .timestamps import LocalTime
+
+    # A backlog replay: a few events a second, over several days
+    start_epoch = int(time.time()) - 3 * 24 * 60 * 60
+    timestrs = [
+        time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start_epoch + i // 3))
+        for i in range(args.count)
+    ]
+
+    def localize_datetime(timestr: str) -> str:
+        return (
+            datetime.datetime.strptime(timestr, "%Y-%m-%d %H:%M:%S")
+            .replace(tzinfo=datetime.timezone.utc)
+            .astimezone()
+        ).strftime("%Y-%m-%d %H:%M:%S")
+
+    local_time = LocalTime()
+    results = []
+    for name, localize in (
+        ("datetime", localize_datetime),
+        ("LocalTime", local_time.localize),
+    ):
+        start = time.perf_counter()
+        results.append([localize(timestr) for timestr in timestrs])
+        report(name, len(timestrs), "timestamps", time.perf_counter() - start)
+    mismatches = sum(a != b for a, b in zip(*results))
+    print(f"mismatches: {mismatches}")
+
+
+def overlay_lines(count: int) -> Iterator[str]:
+    """
+    Kill lines shaped like the overlay's, each different.
+    """
+    for i in range(count):
+        yield (
+            f"2025-01-01 12:{i // 60 % 60:02}:{i % 60:02} "
+            '<span style="color: #E74856">KILL</span>: '
+            f'<span style="color: #3B78FF">Player_{i}</span> '
+            '<span style="color: #CCCCCC">[ORG]</span> killed '
+            f'<span style="color: #16C60C">Target_{i % 97}</span> using '
+            '<span style="color: #E6E600">P4-AR&nbsp;Rifle</span>'
+        )
+
+
+def bench_overlay(args: Namespace) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt6.QtCore import QSize
+    from PyQt6.QtGui import QColor
+    from PyQt6.QtWidgets import QApplication, QGraphicsDropShadowEffect, QLabel
+
+    from .windows.overlay_text import OverlayText
+
+    app = QApplication([])  # pylint: disable=unused-variable # noqa: F841
+    events = list(overlay_lines(args.events))
+    size = QSize(1280, 200)
+
+    def shadow_label() -> QLabel:
+        # The overlay before OverlayText
+        label = QLabel()
+        effect = QGraphicsDropShadowEffect(label)
+        effect.setBlurRadius(0)
+        effect.setColor(QColor("#222222"))
+        effect.setOffset(1, 1)
+        label.setGraphicsEffect(effect)
+        label.setStyleSheet(
+            "font-family: Cascadia Code; font-size: 12px; margin-left: 1px;"
+        )
+        label.resize(size)
+        return label
+
+    for line_count in range(3, args.lines + 1):
+        print(f"line_count={line_count}")
+        lines = deque([""] * line_count)
+        label = shadow_label()
+        start = time.perf_counter()
+        for event in events:
+            lines.popleft()
+            lines.append(event)
+            label.setText("<br>".join(lines))
+            label.grab()
+        report("QLabel", len(events), "events", time.perf_counter() - start)
+
+        lines = deque([""] * line_count)
+        text = OverlayText()
+        text.resize(size)
+        start = time.perf_counter()
+        for event in events:
+            lines.popleft()
+            lines.append(event)
+            text.set_lines(lines)
+            text.grab()
+        report("OverlayText", len(events), "events", time.perf_counter() - start)
+
+
+def peak_rss() -> int:
+    """
+    Bytes
+    """
+    try:
+        import resource
+    except ImportError:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset
+    # Kilobytes, except on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def time_handlers(seconds: dict[str, float], calls: Counter[str]) -> None:
+    """
+    Times every handler call by handler, including its output to the overlay.
+    """
+    from allslain.handlers.handler import Handler
+
+    from .allslain_patch import handler_classes
+
+    depth = 0
+
+    def timed(call):
+        @wraps(call)
+        def __call__(self, data):
+            nonlocal depth
+            # Only the outermost call, not subclasses calling their parent
+            if depth:
+                return call(self, data)
+            depth += 1
+            start = time.perf_counter()
+            try:
+                return call(self, data)
+            finally:
+                depth -= 1
+                name = type(self).__name__
+                seconds[name] += time.perf_counter() - start
+                calls[name] += 1
+
+        return __call__
+
+    for handler in (Handler, *handler_classes()):
+        if call := vars(handler).get("__call__"):
+            handler.__call__ = timed(call)
+
+
+def bench_replay(args: Namespace) -> None:
+    """
+    Runs a log through the app's all-slain thread and overlay, without the game.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt6.QtCore import QCoreApplication
+    from PyQt6.QtWidgets import QApplication
+
+    from .allslain_patch import AllSlain
+    from .args import Args
+    from .config import load_config, load_config_runtime
+
+    app = QCoreApplication([]) if args.no_overlay else QApplication([])
+    config = load_config()
+    gui_args = cast(Args, load_config_runtime(Args()))
+    gui_args.debug = False
+    gui_args.verbose = 0
+    gui_args.trace = None
+    gui_args.profile = False
+
+    with repeated_file(args.file, args.repeat) as path:
+        lines = count_lines(path)
+        print(f"{path}: {os.path.getsize(path) / 1e6:,.0f} MB, {lines:,} lines")
+
+        allslain = AllSlain(gui_args, config, replay=path)
+        allslain.args.player_lookup = args.lookups
+        seconds: defaultdict[str, float] = defaultdict(float)
+        calls: Counter[str] = Counter()
+        time_handlers(seconds, calls)
+
+        events = 0
+
+        def count_event(_) -> None:
+            nonlocal events
+            events += 1
+
+        allslain.event_output.connect(count_event)
+        if not args.no_overlay:
+            from .windows.overlay import Overlay
+
+            overlay = Overlay(None, config)
+            if args.trace:
+                allslain.tracer.enable(True)
+                allslain.output.connect(allslain.tracer.delivered)
+                overlay.tracer = allslain.tracer
+            allslain.output.connect(overlay.update_text)
+        allslain.game_exit.connect(app.quit)
+
+        start = time.perf_counter()
+        allslain.start()
+        app.exec()
+        allslain.wait()
+        elapsed = time.perf_counter() - start
+
+    report("lines", lines, "lines", elapsed)
+    report("events", events, "events", elapsed)
+    print("handlers:")
+    for name, total in sorted(seconds.items(), key=lambda item: -item[1]):
+        print(
+            f"{name:>16}: {calls[name]:>9,} calls {total:>8.3f}s"
+            f" {total / calls[name] * 1e6:>8.1f}us/call"
+        )
+    if not args.no_overlay:
+        print(f"overlay: {overlay.stats}")
+    if allslain.tracer.enabled:
+        print(f"latency:\n{allslain.tracer}")
+    if allslain.lookup is not None:
+        print(f"lookups: {allslain.lookup.stats}")
+    print(f"peak RSS: {peak_rss() / 1e6:,.0f} MB")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="all-slain-gui benchmarks")
+    subparsers = parser.add_subparsers(required=True)
+
+    follow = subparsers.add_parser("follow", help="log reader throughput")
+    follow.add_argument("file", help="Game.log")
+    follow.add_argument(
+        "--repeat", type=int, default=1, help="concatenate the log this many times"
+    )
+    follow.set_defaults(func=bench_follow)
+
+    render = subparsers.add_parser("render", help="overlay HTML rendering")
+    render.add_argument("file", help="Game.log")
+    render.add_argument(
+        "--repeat", type=int, default=1, help="render the events this many times"
+    )
+    render.set_defaults(func=bench_render)
+
+    timestamps = subparsers.add_parser("timestamps", help="timestamp localisation")
+    timestamps.add_argument(
+        "--count", type=int, default=1_000_000, help="number of timestamps"
+    )
+    timestamps.set_defaults(func=bench_timestamps)
+
+    overlay = subparsers.add_parser(
+        "overlay", help="overlay paint time by line count, offscreen"
+    )
+    overlay.add_argument(
+        "--events", type=int, default=1000, help="number of lines scrolled in"
+    )
+    overlay.add_argument("--lines", type=int, default=8, help="largest line_count")
+    overlay.set_defaults(func=bench_overlay)
+
+    replay = subparsers.add_parser(
+        "replay", help="the whole app over a log, headless and without the game"
+    )
+    replay.add_argument("file", help="Game.log")
+    replay.add_argument(
+        "--repeat", type=int, default=1, help="concatenate the log this many times"
+    )
+    replay.add_argument(
+        "--no-overlay", action="store_true", help="skip the overlay, no QtWidgets"
+    )
+    replay.add_argument(
+        "--lookups", action="store_true", help="look players up with the data provider"
+    )
+    replay.add_argument(
+        "--trace", action="store_true", help="trace latency up to the overlay"
+    )
+    replay.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
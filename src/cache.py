@@ -0,0 +1,155 @@
+"""
+
+Player lookups kept on disk between sessions
+
+"""
+
+from __future__ import annotations
+
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from allslain.config import executable_path
+
+
+CACHE_NAME = f"{executable_path()}/allslain_gui.cache.sqlite3"
+
+DAY = 24 * 60 * 60
+
+# Seconds a lookup is good for, by data provider. Orgs don't change often.
+PROVIDER_TTL = {
+    "rsi": 7 * DAY,
+    "starcitizen_api": 7 * DAY,
+    "wks_navcom": 3 * DAY,
+    # Whichever answered first
+    "auto": 3 * DAY,
+}
+DEFAULT_TTL = DAY
+
+# Seconds to remember that a player wasn't found. They may have just been
+# missed, or renamed.
+NEGATIVE_TTL = 60 * 60
+
+# Lookups kept, the least recently used are evicted past this
+MAX_ENTRIES = 50_000
+
+# Inserts between evictions
+EVICT_INTERVAL = 100
+
+
+logger = logging.getLogger("all-slain-gui").getChild("cache")
+
+
+class LookupCache:
+    """
+    Lookups of one data provider. Shared by the lookup threads and the AllSlain
+    thread, so the connection is used under a lock.
+    """
+
+    def __init__(self, provider: str, path: str = CACHE_NAME):
+        self.provider = provider
+        self.ttl = PROVIDER_TTL.get(provider, DEFAULT_TTL)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS lookups ("
+                "provider TEXT NOT NULL, "
+                "name TEXT NOT NULL, "
+                # NULL for not found
+                "value BLOB, "
+                "expires REAL NOT NULL, "
+                "used REAL NOT NULL, "
+                "PRIMARY KEY (provider, name)) WITHOUT ROWID"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS lookups_used ON lookups (used)")
+            expired = self.db.execute(
+                "DELETE FROM lookups WHERE expires < ?", (time.time(),)
+            ).rowcount
+        if expired:
+            logger.info(f"dropped {expired} expired lookups")
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.inserts = 0
+
+    def get(self, name: str) -> tuple[bool, Any]:
+        """
+        Returns whether the name was cached, and its lookup.
+        """
+        now = time.time()
+        key = name.lower()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, used FROM lookups "
+                "WHERE provider = ? AND name = ? AND expires >= ?",
+                (self.provider, key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            # Only refreshed daily, so that hits do not each cost a write
+            if row[1] < now - DAY:
+                with self.db:
+                    self.db.execute(
+                        "UPDATE lookups SET used = ? WHERE provider = ? AND name = ?",
+                        (now, self.provider, key),
+                    )
+        if row[0] is None:
+            self.negative_hits += 1
+            return True, None
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.debug(f"unreadable lookup of {name}: {e}")
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, value
+
+    def put(self, name: str, value: Any) -> None:
+        now = time.time()
+        if value is None:
+            blob, ttl = None, NEGATIVE_TTL
+        else:
+            try:
+                blob, ttl = pickle.dumps(value), self.ttl
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.debug(f"not caching lookup of {name}: {e}")
+                return
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO lookups (provider, name, value, expires, used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.provider, name.lower(), blob, now + ttl, now),
+            )
+            self.inserts += 1
+            if self.inserts % EVICT_INTERVAL == 0:
+                self.evict()
+
+    def evict(self) -> None:
+        (count,) = self.db.execute("SELECT COUNT(*) FROM lookups").fetchone()
+        if count <= MAX_ENTRIES:
+            return
+        self.db.execute(
+            "DELETE FROM lookups WHERE (provider, name) IN "
+            "(SELECT provider, name FROM lookups ORDER BY used LIMIT ?)",
+            (count - MAX_ENTRIES,),
+        )
+        logger.debug(f"evicted {count - MAX_ENTRIES} lookups")
+
+    @property
+    def stats(self) -> str:
+        lookups = self.hits + self.negative_hits + self.misses
+        hit_rate = (self.hits + self.negative_hits) / lookups if lookups else 0.0
+        return f"hits={self.hits} not found={self.negative_hits} misses={self.misses} hit rate={hit_rate:.1%}"
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
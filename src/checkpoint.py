@@ -0,0 +1,81 @@
+"""
+
+Where Game.log was read up to, so a restart can continue from there
+
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from hashlib import blake2b
+from typing import Any, TypedDict
+
+from allslain.config import executable_path
+
+
+CHECKPOINT_NAME = f"{executable_path()}/allslain_gui.checkpoint.json"
+
+# Seconds between checkpoint writes while following
+CHECKPOINT_INTERVAL = 5
+
+# LogState attributes needed to continue parsing mid-file
+STATE_FIELDS = ("player_name",)
+
+# The start of Game.log has the session's start time, so it tells apart two logs
+# that get the same inode
+HEAD_SIZE = 256
+
+
+logger = logging.getLogger("all-slain-gui").getChild("checkpoint")
+
+
+class Checkpoint(TypedDict):
+    dev: int
+    ino: int
+    head: str
+    offset: int
+    state: dict[str, Any]
+
+
+def file_head(path: str) -> str:
+    with open(path, "rb") as f:
+        return blake2b(f.read(HEAD_SIZE), digest_size=16).hexdigest()
+
+
+def load_checkpoint() -> Checkpoint | None:
+    try:
+        with open(CHECKPOINT_NAME, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"ignoring checkpoint: {e}")
+        return None
+
+
+def save_checkpoint(checkpoint: Checkpoint) -> None:
+    tmp = f"{CHECKPOINT_NAME}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, CHECKPOINT_NAME)
+
+
+def resume_offset(checkpoint: Checkpoint | None, path: str) -> int:
+    """
+    Returns the offset to continue reading `path` from, 0 if the checkpoint is for another file.
+    """
+    if checkpoint is None:
+        return 0
+    try:
+        st = os.stat(path)
+        if (
+            (st.st_dev, st.st_ino) != (checkpoint["dev"], checkpoint["ino"])
+            or st.st_size < checkpoint["offset"]
+            or file_head(path) != checkpoint["head"]
+        ):
+            return 0
+    except (KeyError, OSError):
+        return 0
+    return checkpoint["offset"]
@@ -3,13 +3,14 @@ from argparse import Namespace
 from typing import TYPE_CHECKING, Any, Literal, NotRequired, TypedDict, cast
 
 from allslain.config import TOMLFile, executable_path, merge, mergeattr
-from tomlkit import TOMLDocument, comment, document, nl, table
+from tomlkit import TOMLDocument, aot, comment, document, nl, table
 
 
 CONFIG_NAME = f"{executable_path()}/allslain_gui.conf.toml"
 
 
 OverlayPosition = Literal["top", "bottom"]
+LogReader = Literal["chunked", "readline"]
 
 
 class DiscordWebhook(TypedDict):
@@ -24,11 +25,24 @@ class DiscordWebhook(TypedDict):
     url: str
 
 
+class WebhookDestination(TypedDict):
+    url: str
+    name: NotRequired[str]
+    enabled: NotRequired[bool]
+    # Handler names, e.g. "KillP"
+    events: NotRequired[list[str]]
+    involves_self: NotRequired[bool]
+    players: NotRequired[list[str]]
+    orgs: NotRequired[list[str]]
+
+
 if TYPE_CHECKING:
 
     class ConfigDiscord(TypedDict):
         webhook1_enabled: bool
         webhook1_info: DiscordWebhook
+        coalesce_window: float
+        webhooks: list[WebhookDestination]
 
     class ConfigMain(TypedDict):
         screen: str
@@ -36,6 +50,14 @@ if TYPE_CHECKING:
         auto_exit: bool
         line_count: int
         check_updates: bool
+        log_reader: LogReader
+        overlay_coalesce: bool
+        overlay_refresh_hz: int
+        history_size: int
+        lookup_auto: bool
+        lookup_snapshot: bool
+        metrics_file: str
+        metrics_interval: int
 
     # Not allowed, but it works™
     class ConfigDocument(TOMLDocument, TypedDict):  # type: ignore
@@ -52,6 +74,14 @@ class Config(Namespace):
     auto_exit: bool = True
     line_count: int = 4
     check_updates: bool = True
+    log_reader: LogReader = "chunked"
+    overlay_coalesce: bool = True
+    overlay_refresh_hz: int = 0
+    history_size: int = 100_000
+    lookup_auto: bool = False
+    lookup_snapshot: bool = False
+    metrics_file: str = ""
+    metrics_interval: int = 15
 
 
 # fmt: off
@@ -84,6 +114,46 @@ def create_default_config() -> TOMLDocument:
     main.add("check_updates", Config.check_updates)
     main.add(nl())
 
+    main.add(comment('How Game.log is read. "chunked" reads in bulk, "readline" reads a line at a time.'))
+    main.add(comment('Default: "chunked"'))
+    main.add("log_reader", Config.log_reader)
+    main.add(nl())
+
+    main.add(comment("Batch lines that arrive together into one overlay repaint"))
+    main.add(comment('Default: true'))
+    main.add("overlay_coalesce", Config.overlay_coalesce)
+    main.add(nl())
+
+    main.add(comment("Maximum overlay repaints per second when batching. 0 uses the monitor's refresh rate."))
+    main.add(comment('Default: 0'))
+    main.add("overlay_refresh_hz", Config.overlay_refresh_hz)
+    main.add(nl())
+
+    main.add(comment("Number of events kept in the History window"))
+    main.add(comment('Default: 100000'))
+    main.add("history_size", Config.history_size)
+    main.add(nl())
+
+    main.add(comment("Look players up with the fastest data provider, and also ask another if it's slow or down."))
+    main.add(comment('Default: false'))
+    main.add("lookup_auto", Config.lookup_auto)
+    main.add(nl())
+
+    main.add(comment("Look players up in the imported offline snapshot instead of allslain's data provider."))
+    main.add(comment('Default: false'))
+    main.add("lookup_snapshot", Config.lookup_snapshot)
+    main.add(nl())
+
+    main.add(comment('File to write metrics to periodically: JSON if it ends with ".json", otherwise a Prometheus textfile. Empty to not write them.'))
+    main.add(comment('Default: ""'))
+    main.add("metrics_file", Config.metrics_file)
+    main.add(nl())
+
+    main.add(comment("Seconds between writes of the metrics file"))
+    main.add(comment('Default: 15'))
+    main.add("metrics_interval", Config.metrics_interval)
+    main.add(nl())
+
     doc.add("main", main)
 
     discord = table()
@@ -92,6 +162,25 @@ def create_default_config() -> TOMLDocument:
     discord.add("webhook1_info", {"url": ""})
     discord.add(nl())
 
+    discord.add(comment("Seconds to wait for more events before sending, so that a burst of events goes out in one message."))
+    discord.add(comment("Default: 1.0"))
+    discord.add("coalesce_window", 1.0)
+    discord.add(nl())
+
+    discord.add(comment("More webhooks, each sent the events that match all of its filters:"))
+    discord.add(comment("[[discord.webhooks]]"))
+    discord.add(comment('name = "Org kills"'))
+    discord.add(comment('url = "https://discord.com/api/webhooks/..."'))
+    discord.add(comment("enabled = true"))
+    discord.add(comment('# Handler names. Default: ["KillP", "KillV"]'))
+    discord.add(comment('events = ["KillP", "KillV"]'))
+    discord.add(comment("# Only events with you in them. Default: true"))
+    discord.add(comment("involves_self = false"))
+    discord.add(comment("# Only events with any of these players or orgs in them"))
+    discord.add(comment("players = []"))
+    discord.add(comment('orgs = ["EXAMPLE"]'))
+    discord.add("webhooks", aot())
+
     doc.add("discord", discord)
 
     return doc
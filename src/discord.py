@@ -1,4 +1,38 @@
+from __future__ import annotations
+
+import logging
+import queue
+import time
+from typing import Sequence
+
 import requests
+from PyQt6.QtCore import QThread
+from requests.adapters import HTTPAdapter
+
+from .outbox import Outbox
+from .stats import LatencyStats
+
+
+logger = logging.getLogger("all-slain-gui").getChild("discord")
+
+
+# Messages waiting to be sent before new ones are dropped
+QUEUE_SIZE = 100
+
+# Seconds. The wait after a failed send doubles up to the max.
+BACKOFF_MIN = 1.0
+BACKOFF_MAX = 300.0
+
+# Seconds to wait for new messages when there is nothing to send
+IDLE_TIMEOUT = 60.0
+
+MESSAGE_PREFIX = "```ansi\n"
+MESSAGE_SUFFIX = "\n```"
+# Discord's message length limit, less the code block around the text
+TEXT_LIMIT = 2000 - len(MESSAGE_PREFIX) - len(MESSAGE_SUFFIX)
+
+# Events sent in one message at most
+PACK_MAX = 50
 
 
 def get_webhook(url: str):
@@ -11,11 +45,210 @@ def get_webhook(url: str):
         return {}
 
 
-def post_webhook(url: str, text: str):
-    return requests.post(
+def post_webhook(url: str, text: str, session: requests.Session | None = None):
+    return (session or requests).post(
         url,
         json={
-            "content": f"```ansi\n{text}\n```",
+            "content": f"{MESSAGE_PREFIX}{text}{MESSAGE_SUFFIX}",
         },
         timeout=5,
     )
+
+
+def split_message(text: str, limit: int = TEXT_LIMIT) -> list[str]:
+    """
+    Splits text on line boundaries into parts that fit in a message.
+    """
+    if len(text) <= limit:
+        return [text]
+    parts: list[str] = []
+    part = ""
+    for line in text.split("\n"):
+        # A single line that's too long has to be cut
+        while len(line) > limit:
+            if part:
+                parts.append(part)
+                part = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if part and len(part) + 1 + len(line) > limit:
+            parts.append(part)
+            part = line
+        else:
+            part = f"{part}\n{line}" if part else line
+    if part:
+        parts.append(part)
+    return parts
+
+
+def pack_messages(texts: list[str], limit: int = TEXT_LIMIT) -> int:
+    """
+    Returns how many of `texts`, which each fit in a message, fit in one message together.
+    """
+    length = -1
+    for count, text in enumerate(texts):
+        length += 1 + len(text)
+        if length > limit:
+            return max(count, 1)
+    return len(texts)
+
+
+def retry_after(response: requests.Response) -> float:
+    """
+    Seconds to wait before sending again, from Discord's rate limit headers.
+    """
+    if response.status_code == 429:
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            pass
+        try:
+            return float(response.json()["retry_after"])
+        except (KeyError, ValueError, requests.JSONDecodeError):
+            return 1.0
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return float(response.headers["X-RateLimit-Reset-After"])
+        except (KeyError, ValueError):
+            pass
+    return 0.0
+
+
+class WebhookDispatcher(QThread):
+    def __init__(self, url: str, window: float = 0.0):
+        """
+        Events posted within `window` seconds of the first one are sent together.
+        """
+        super().__init__()
+        self.setObjectName("WebhookDispatcher")
+        self.url = url
+        self.window = window
+        # Messages from the parser thread, moved to the outbox in batches
+        self.queue: queue.Queue[str | None] = queue.Queue(QUEUE_SIZE)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.latency = LatencyStats()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.messages = 0
+        self.events = 0
+        # From the first event in a message being posted to it being sent
+        self.delay = LatencyStats()
+        # Events in the outbox
+        self.pending = 0
+        # Consecutive failed sends
+        self._failures = 0
+        self._blocked_until = 0.0
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() + self.pending
+
+    @property
+    def events_per_message(self) -> float:
+        return self.events / self.messages if self.messages else 0.0
+
+    def post(self, text: str) -> None:
+        """
+        Queues a message without blocking.
+        """
+        try:
+            self.queue.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("webhook queue full, dropping message")
+
+    def stop(self) -> None:
+        self._stopping = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def take(self, timeout: float) -> list[str]:
+        """
+        Waits up to `timeout` for a message, then takes everything that is queued.
+        """
+        texts: list[str] = []
+        try:
+            text = self.queue.get(timeout=timeout) if timeout > 0 else None
+            while True:
+                if text is not None:
+                    texts.append(text)
+                text = self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        return texts
+
+    def store(self, outbox: Outbox, timeout: float) -> None:
+        outbox.add(
+            [part for text in self.take(timeout) for part in split_message(text)]
+        )
+
+    def run(self):
+        outbox = Outbox(self.url)
+        try:
+            while not self._stopping:
+                wait = self._blocked_until - time.monotonic()
+                if outbox.pending and self.window:
+                    wait = max(wait, outbox.oldest() + self.window - time.time())
+                if outbox.pending and wait <= 0:
+                    self.store(outbox, 0)
+                    self.send(outbox)
+                else:
+                    self.store(outbox, wait if outbox.pending else IDLE_TIMEOUT)
+                self.pending = outbox.pending
+        finally:
+            # Anything not sent yet goes out after the next start
+            self.store(outbox, 0)
+            outbox.close()
+            self.session.close()
+        logger.debug(
+            f"webhook sent={self.sent} failed={self.failed} dropped={self.dropped} "
+            f"pending={self.pending} latency: {self.latency} "
+            f"events/message={self.events_per_message:.2f} delay: {self.delay}"
+        )
+
+    def send(self, outbox: Outbox) -> None:
+        if not (rows := outbox.next(PACK_MAX)):
+            outbox.pending = 0
+            return
+        ids, texts, created = zip(*rows[: pack_messages([row[1] for row in rows])])
+
+        start = time.perf_counter()
+        try:
+            response = post_webhook(self.url, "\n".join(texts), self.session)
+        except requests.RequestException as e:
+            self.backoff(outbox, ids, str(e))
+            return
+        self.latency.add(time.perf_counter() - start)
+
+        if wait := retry_after(response):
+            self._blocked_until = time.monotonic() + wait
+        if response.status_code == 429:
+            logger.debug(f"webhook rate limited for {wait}s")
+            outbox.failed(ids)
+        elif response.ok:
+            outbox.done(ids)
+            self.sent += 1
+            self.messages += 1
+            self.events += len(ids)
+            self.delay.add(time.time() - min(created))
+            self._failures = 0
+        elif response.status_code >= 500:
+            self.backoff(outbox, ids, str(response.status_code))
+        else:
+            # Rejected, e.g. the webhook was deleted. Sending it again won't help.
+            outbox.done(ids)
+            self.failed += 1
+            logger.warning(f"webhook rejected message: {response.status_code}")
+
+    def backoff(self, outbox: Outbox, ids: Sequence[int], reason: str) -> None:
+        outbox.failed(ids)
+        self.failed += 1
+        delay = min(BACKOFF_MIN * 2**self._failures, BACKOFF_MAX)
+        self._failures += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        logger.warning(f"webhook failed, retrying in {delay:g}s: {reason}")
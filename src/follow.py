@@ -0,0 +1,372 @@
+"""
+
+Game.log tailing
+
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import select
+import sys
+import time
+from typing import IO, TYPE_CHECKING, Callable, Iterator, cast
+
+from .stats import LatencyStats
+
+
+if TYPE_CHECKING:
+    from io import TextIOWrapper
+
+
+logger = logging.getLogger("all-slain-gui").getChild("follow")
+
+
+# Seconds. The poll interval doubles while idle and resets when data arrives.
+# Reading at EOF is cheap, so polling without notifications stays frequent to
+# keep the latency of an event after a quiet spell low.
+POLL_INTERVAL_MIN = 0.01
+POLL_INTERVAL_MAX = 0.1
+# Seconds to wait at most with notifications that can be trusted
+NOTIFY_TIMEOUT = 1.0
+
+# Bytes read at a time by the chunked reader
+CHUNK_SIZE = 1 << 20
+
+
+class Waiter:
+    """
+    Sleeps for the whole timeout. Used when no change notification is available.
+    """
+
+    # Whether a wakeup can be trusted to mean the file changed
+    notifies = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(timeout)
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWaiter(Waiter):
+    notifies = True
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, path: str):
+        import ctypes
+        import ctypes.util
+
+        super().__init__(path)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(path),
+            self.IN_MODIFY | self.IN_ATTRIB | self.IN_DELETE_SELF | self.IN_MOVE_SELF,
+        )
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {path}")
+        # A replacement file is created or moved in next to it
+        libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(os.path.dirname(os.path.abspath(path))),
+            self.IN_CREATE | self.IN_MOVED_TO,
+        )
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Win32Waiter(Waiter):
+    # Size and write time changes of a file that is still open for writing are
+    # only reported once NTFS flushes its metadata, so keep polling as well.
+    notifies = False
+
+    def __init__(self, path: str):
+        import win32con
+        import win32file
+
+        super().__init__(path)
+        self.handle = win32file.FindFirstChangeNotification(
+            os.path.dirname(os.path.abspath(path)),
+            False,
+            win32con.FILE_NOTIFY_CHANGE_SIZE | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE,
+        )
+
+    def wait(self, timeout: float) -> bool:
+        import win32event
+        import win32file
+
+        rc = win32event.WaitForSingleObject(self.handle, int(timeout * 1000))
+        if rc != win32event.WAIT_OBJECT_0:
+            return False
+        win32file.FindNextChangeNotification(self.handle)
+        return True
+
+    def close(self) -> None:
+        import win32file
+
+        win32file.FindCloseChangeNotification(self.handle)
+
+
+def create_waiter(path: str) -> Waiter:
+    try:
+        if sys.platform == "linux":
+            return InotifyWaiter(path)
+        if sys.platform == "win32":
+            return Win32Waiter(path)
+    except (AttributeError, ImportError, OSError) as e:
+        logger.warning(f"change notification unavailable, polling: {e}")
+    return Waiter(path)
+
+
+def file_identity(st: os.stat_result) -> tuple[int, int]:
+    return st.st_dev, st.st_ino
+
+
+class LogFollower:
+    def __init__(
+        self,
+        f: TextIOWrapper,
+        newline: str,
+        stopped: Callable[[], bool],
+        idle: Callable[[], bool] | None = None,
+        chunked: bool = True,
+        start: int = 0,
+        stop_at_eof: bool = False,
+    ):
+        """
+        `idle` is called whenever the end of the file is reached, and stops the
+        follower by returning False.
+
+        `chunked` reads raw bytes in bulk instead of a line at a time through `f`.
+
+        `start` is a byte offset at the start of a line to skip ahead to.
+
+        `stop_at_eof` reads the file once instead of following it, for replays.
+        """
+        self.f = f
+        self.path = os.path.abspath(f.name)
+        self.chunked = chunked
+        self.newline = newline
+        self.stopped = stopped
+        self.idle = idle
+        self.waiter = create_waiter(self.path)
+        # From the file being written to the line being handled. Without change
+        # notifications the write is only known to within a poll interval.
+        self.latency = LatencyStats()
+        # time.time_ns() the file was last written, as of the last wait. 0 while
+        # reading the backlog.
+        self.written_ns = 0
+        # time.time_ns() of the last read that returned anything
+        self.read_ns = 0
+        # Byte offset read up to, counted in characters while reading lines
+        self.read_offset = 0
+        self.lines = 0
+        # (st_dev, st_ino) of the file being read
+        self.identity = file_identity(os.fstat(f.fileno()))
+        self.reopened = 0
+        self.start = start
+        self.stop_at_eof = stop_at_eof
+        # Byte offset of the end of the last line handled, updated at EOF
+        self.position = 0
+        self._partial = b""
+
+    def __iter__(self) -> Iterator[str]:
+        if self.chunked:
+            return self._follow_chunked()
+        return self._follow_readline()
+
+    def _wait(self, fileno: int, interval: float) -> float:
+        waited_ns = time.time_ns()
+        woken = self.waiter.wait(NOTIFY_TIMEOUT if self.waiter.notifies else interval)
+        if not woken:
+            interval = min(interval * 2, POLL_INTERVAL_MAX)
+        if woken and self.waiter.notifies:
+            # Woken by the write itself
+            self.written_ns = time.time_ns()
+        else:
+            # NTFS updates the write time of a file that's held open lazily, so
+            # it can be long out of date. Whatever was read since was written
+            # after the wait started, give or take a write during the last read.
+            self.written_ns = max(os.fstat(fileno).st_mtime_ns, waited_ns)
+        return interval
+
+    def _check_file(self, position: int) -> str | None:
+        """
+        Returns why the file needs to be reopened, if it does.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # Moved away and not recreated yet, keep reading the old one
+            return None
+        if file_identity(st) != self.identity:
+            return "replaced"
+        if st.st_size < position:
+            return "truncated"
+        return None
+
+    def _reopen(self, binary: bool) -> IO:
+        logger.info(f"{self.path} was replaced, reopening")
+        # Watches follow the old file
+        self.waiter.close()
+        self.waiter = create_waiter(self.path)
+        if binary:
+            fh: IO = open(self.path, "rb", buffering=0)
+        else:
+            fh = open(self.path, encoding=self.f.encoding, errors=self.f.errors)
+        st = os.fstat(fh.fileno())
+        self.identity = file_identity(st)
+        self.written_ns = st.st_mtime_ns
+        self.reopened += 1
+        return fh
+
+    def _follow_readline(self) -> Iterator[str]:
+        f = self.f
+        if self.start > f.tell():
+            f.seek(self.start)
+        interval = POLL_INTERVAL_MIN
+        try:
+            while not self.stopped():
+                if line := f.readline():
+                    self.read_ns = time.time_ns()
+                    self.read_offset += len(line)
+                    self.lines += 1
+                    yield line.rstrip(self.newline)
+                    if self.written_ns:
+                        self.latency.add((time.time_ns() - self.written_ns) / 1e9)
+                    interval = POLL_INTERVAL_MIN
+                    continue
+
+                self.position = self.read_offset = f.tell()
+                if self.stop_at_eof:
+                    break
+                if self.idle is not None and not self.idle():
+                    break
+
+                reason = self._check_file(self.position)
+                if reason == "replaced":
+                    while line := f.readline():
+                        yield line.rstrip(self.newline)
+                    if f is not self.f:
+                        f.close()
+                    f = cast("TextIOWrapper", self._reopen(False))
+                    continue
+                if reason == "truncated":
+                    logger.info(f"{self.path} was truncated")
+                    f.seek(0)
+                    continue
+
+                interval = self._wait(f.fileno(), interval)
+        finally:
+            if f is not self.f:
+                f.close()
+
+    def _split(self, data: bytes) -> list[str]:
+        end = data.rfind(b"\n")
+        if end == -1:
+            self._partial += data
+            return []
+        # Only complete lines are decoded, so a multibyte character split
+        # across reads is never decoded in halves.
+        text = (self._partial + data[:end]).decode(
+            self.f.encoding, self.f.errors or "strict"
+        )
+        self._partial = data[end + 1 :]
+        # Only the line endings readline translates, not every line boundary
+        # str.splitlines knows, like \x0c or \u2028. The last line's \r is
+        # before the cut, so it's stripped line by line.
+        return [line[:-1] if line.endswith("\r") else line for line in text.split("\n")]
+
+    def _emit(self, lines: list[str]) -> Iterator[str]:
+        self.lines += len(lines)
+        if self.written_ns:
+            for line in lines:
+                yield line
+                self.latency.add((time.time_ns() - self.written_ns) / 1e9)
+        else:
+            yield from lines
+
+    def _follow_chunked(self) -> Iterator[str]:
+        fb: IO = open(self.path, "rb", buffering=0)
+        # Anything the text wrapper has buffered past its position is read again
+        fb.seek(max(self.f.tell(), self.start))
+        interval = POLL_INTERVAL_MIN
+        try:
+            while not self.stopped():
+                if data := fb.read(CHUNK_SIZE):
+                    self.read_ns = time.time_ns()
+                    self.read_offset = fb.tell()
+                    interval = POLL_INTERVAL_MIN
+                    yield from self._emit(self._split(data))
+                    continue
+
+                self.position = fb.tell() - len(self._partial)
+                if self.stop_at_eof:
+                    # The last line, if it has no newline
+                    yield from self._emit(self._split(b"\n") if self._partial else [])
+                    break
+                if self.idle is not None and not self.idle():
+                    break
+
+                reason = self._check_file(fb.tell())
+                if reason == "replaced":
+                    # The old file is finished, so its last line is too
+                    if (data := fb.read()) or self._partial:
+                        if not data.endswith(b"\n"):
+                            data += b"\n"
+                        yield from self._emit(self._split(data))
+                    fb.close()
+                    fb = self._reopen(True)
+                    continue
+                if reason == "truncated":
+                    logger.info(f"{self.path} was truncated")
+                    fb.seek(0)
+                    self._partial = b""
+                    continue
+
+                interval = self._wait(fb.fileno(), interval)
+        finally:
+            fb.close()
+
+    def behind(self) -> int:
+        """
+        Bytes written that haven't been read yet.
+        """
+        try:
+            return max(0, os.stat(self.path).st_size - self.read_offset)
+        except OSError:
+            return 0
+
+    def close(self) -> None:
+        self.waiter.close()
+        logger.debug(f"write to emit latency: {self.latency}")
@@ -0,0 +1,197 @@
+"""
+
+Lookups sent to the fastest data provider, and to a second one when the first
+is slow or fails
+
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from importlib import import_module
+from typing import Any, Callable
+
+
+logger = logging.getLogger("all-slain-gui").getChild("hedge")
+
+
+# Keys of allslain.data_providers modules
+PROVIDERS = ("rsi", "starcitizen_api", "wks_navcom")
+
+# Seconds, upper bounds of the latency histogram's buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, float("inf"))
+
+# Latencies the percentiles are taken over
+LATENCY_WINDOW = 100
+
+# Below this many samples, hedge after HEDGE_DELAY_DEFAULT
+MIN_SAMPLES = 10
+HEDGE_DELAY_DEFAULT = 1.0
+
+# A provider that fails this many times in a row is skipped for DOWN_TIME seconds
+FAILURES_DOWN = 3
+DOWN_TIME = 60
+
+
+class ProviderStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+        # Exception name -> count
+        self.errors: Counter[str] = Counter()
+        # Lookups answered first
+        self.wins = 0
+        self.failures_in_row = 0
+        self.down_until = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.failures_in_row = 0
+
+    def record_error(self, e: Exception) -> None:
+        self.errors[type(e).__name__] += 1
+        self.failures_in_row += 1
+        if self.failures_in_row >= FAILURES_DOWN:
+            self.down_until = time.monotonic() + DOWN_TIME
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def quantile(self, q: float, default: float) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return default
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    @property
+    def p50(self) -> float:
+        # Unmeasured providers sort first, so they get measured
+        return self.quantile(0.5, 0.0)
+
+    @property
+    def p90(self) -> float:
+        return self.quantile(0.9, HEDGE_DELAY_DEFAULT)
+
+    def __str__(self) -> str:
+        buckets = " ".join(
+            f"{'<' + format(bound, 'g') + 's' if bound != float('inf') else 'more'}:{count}"
+            for bound, count in zip(LATENCY_BUCKETS, self.histogram)
+        )
+        errors = ", ".join(f"{name} {count}" for name, count in self.errors.items())
+        status = "" if self.healthy else " (down)"
+        return (
+            f"{self.name}{status}: won {self.wins},"
+            f" p50 {self.p50 * 1000:.0f}ms p90 {self.p90 * 1000:.0f}ms\n"
+            f"  {buckets}\n"
+            f"  errors: {errors or 'none'}"
+        )
+
+
+def load_providers(
+    args: Any, configured: str, lookup: Callable[..., Any]
+) -> dict[str, Callable[..., Any]]:
+    """
+    The lookups of every data provider that can be set up, starting with the one
+    allslain already has.
+    """
+    lookups = {configured: lookup} if configured else {}
+    for key in PROVIDERS:
+        if key in lookups:
+            continue
+        try:
+            module = import_module(f"allslain.data_providers.{key}")
+            cls = next(
+                v
+                for v in vars(module).values()
+                if isinstance(v, type)
+                and v.__module__ == module.__name__
+                and callable(getattr(v, "lookup_player", None))
+            )
+            lookups[key] = cls(args).lookup_player
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.info(f"data provider {key} unavailable: {e}")
+    return lookups
+
+
+class HedgedLookup:
+    """
+    A lookup_player that asks the fastest healthy provider first. If it hasn't
+    answered within its p90 latency, or fails, the next one is asked too, and the
+    first answer wins.
+    """
+
+    def __init__(self, lookups: dict[str, Callable[..., Any]]):
+        self.lookups = lookups
+        self.stats = {name: ProviderStats(name) for name in lookups}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(2 * len(lookups), thread_name_prefix="hedge")
+        self.hedged = 0
+
+    def ordered(self) -> list[str]:
+        with self.lock:
+            return sorted(
+                self.lookups,
+                key=lambda name: (
+                    not self.stats[name].healthy,
+                    self.stats[name].p50,
+                ),
+            )
+
+    def timed(self, provider: str, name: str, *args, **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            result = self.lookups[provider](name, *args, **kwargs)
+        except Exception as e:
+            with self.lock:
+                self.stats[provider].record_error(e)
+            raise
+        with self.lock:
+            self.stats[provider].record(time.perf_counter() - start)
+        return result
+
+    def __call__(self, name: str, *args, **kwargs) -> Any:
+        queue = self.ordered()
+        futures: dict[Future, str] = {}
+
+        def ask_next() -> None:
+            provider = queue.pop(0)
+            futures[
+                self.executor.submit(self.timed, provider, name, *args, **kwargs)
+            ] = provider
+
+        ask_next()
+        timeout: float | None = self.stats[futures[next(iter(futures))]].p90
+        error: BaseException | None = None
+        while futures:
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            timeout = None
+            if not done:
+                if queue:
+                    self.hedged += 1
+                    ask_next()
+                continue
+            for future in done:
+                provider = futures.pop(future)
+                if (error := future.exception()) is None:
+                    with self.lock:
+                        self.stats[provider].wins += 1
+                    return future.result()
+                # Failed, so ask the next one straight away
+                if queue:
+                    ask_next()
+        assert error is not None
+        raise error
+
+    def __str__(self) -> str:
+        with self.lock:
+            return f"hedged: {self.hedged}\n" + "\n".join(
+                str(stats) for stats in self.stats.values()
+            )
@@ -0,0 +1,266 @@
+"""
+
+Player lookups on a thread pool, so the log isn't held up by the network
+
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from typing import TYPE_CHECKING, Any, Callable
+
+
+if TYPE_CHECKING:
+    from .cache import LookupCache
+
+
+logger = logging.getLogger("all-slain-gui").getChild("lookup")
+
+
+LOOKUP_WORKERS = 4
+
+# Prefetches get their own, smaller pool, so they never hold up lookups for
+# events
+PREFETCH_WORKERS = 2
+
+# Prefetches waiting, past this new names are skipped
+PREFETCH_QUEUE = 100
+
+# Lookups kept in memory
+RESULTS_SIZE = 4096
+
+# Seconds a failed lookup returns None for, before the name is looked up again
+FAILURE_EXPIRY = 30.0
+
+
+class PendingEvent:
+    """
+    An event that was output before its lookups finished, to be formatted again
+    once they have.
+    """
+
+    __slots__ = (
+        "handler",
+        "data",
+        "prefix",
+        "line",
+        "names",
+        "text",
+        "player_name",
+        "dispatch_by",
+    )
+
+    def __init__(
+        self, handler: Any, data: Any, prefix: str, line: int, names: set[str]
+    ):
+        self.handler = handler
+        self.data = data
+        # Timestamp and header, as first output
+        self.prefix = prefix
+        # Number of the line it was output as, counting only AllSlain's
+        self.line = line
+        # Lookups still to finish
+        self.names = names
+        # Held back from webhooks until then: the text as first output, the
+        # player's name then, and the time.monotonic() it's sent by anyway.
+        # dispatch_by is 0 when it isn't held.
+        self.text = ""
+        self.player_name: str | None = None
+        self.dispatch_by = 0.0
+
+    def hold(self, text: str, player_name: str | None, dispatch_by: float) -> None:
+        self.text = text
+        self.player_name = player_name
+        self.dispatch_by = dispatch_by
+
+
+class AsyncLookup:
+    """
+    Stands in for a data provider's lookup_player. A name that hasn't been looked
+    up yet returns None straight away, like a failed lookup, and is looked up in
+    the background. The names that missed while formatting an event are in
+    `missed`, and names whose lookups finished are in `ready`.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[..., Any],
+        cache: LookupCache | None = None,
+        workers: int = LOOKUP_WORKERS,
+    ):
+        self.lookup = lookup
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="lookup")
+        self.prefetch_executor = ThreadPoolExecutor(
+            PREFETCH_WORKERS, thread_name_prefix="prefetch"
+        )
+        self.lock = threading.Lock()
+        self.results: OrderedDict[str, Any] = OrderedDict()
+        # Name -> time.monotonic() of its failed lookup
+        self.failed: OrderedDict[str, float] = OrderedDict()
+        self.inflight: dict[str, Future] = {}
+        # The in flight lookups that are prefetches
+        self.prefetching: set[str] = set()
+        self.missed: list[str] = []
+        self.ready: SimpleQueue[str] = SimpleQueue()
+        self.hits = 0
+        self.misses = 0
+        # Lookups that joined one already in flight
+        self.deduped = 0
+        self.prefetched = 0
+        self.prefetch_skipped = 0
+
+    def __call__(self, name: str, *args, **kwargs) -> Any:
+        with self.lock:
+            try:
+                result = self.results[name]
+            except KeyError:
+                pass
+            else:
+                self.results.move_to_end(name)
+                self.hits += 1
+                return result
+            if self.failed_recently(name):
+                return None
+
+        if self.cache is not None:
+            found, result = self.cache.get(name)
+            if found:
+                with self.lock:
+                    self.results[name] = result
+                return result
+
+        future = None
+        with self.lock:
+            self.misses += 1
+            if (inflight := self.inflight.get(name)) is not None and not (
+                # Queued behind other prefetches, look it up now instead
+                name in self.prefetching
+                and inflight.cancel()
+            ):
+                self.deduped += 1
+            else:
+                self.prefetching.discard(name)
+                future = self.submit(self.executor, name, *args, **kwargs)
+        if future is not None:
+            self.watch(name, future)
+        self.missed.append(name)
+        return None
+
+    def prefetch(self, name: str) -> None:
+        """
+        Looks a name up ahead of any event it's in, if there's room.
+        """
+        with self.lock:
+            if (
+                name in self.results
+                or name in self.inflight
+                or self.failed_recently(name)
+            ):
+                return
+            if len(self.prefetching) >= PREFETCH_QUEUE:
+                self.prefetch_skipped += 1
+                return
+        if self.cache is not None:
+            found, result = self.cache.get(name)
+            if found:
+                with self.lock:
+                    self.results[name] = result
+                return
+        with self.lock:
+            if name in self.inflight:
+                return
+            self.prefetching.add(name)
+            self.prefetched += 1
+            future = self.submit(self.prefetch_executor, name)
+        self.watch(name, future)
+
+    def submit(
+        self, executor: ThreadPoolExecutor, name: str, *args, **kwargs
+    ) -> Future:
+        """
+        Called with the lock held, the future is watched once it's released.
+        """
+        future = executor.submit(self.lookup, name, *args, **kwargs)
+        self.inflight[name] = future
+        return future
+
+    def watch(self, name: str, future: Future) -> None:
+        # Called straight away if it's already done, which takes the lock
+        future.add_done_callback(lambda f: self.done(name, f))
+
+    def failed_recently(self, name: str) -> bool:
+        """
+        Called with the lock held
+        """
+        if (failed := self.failed.get(name)) is None:
+            return False
+        if time.monotonic() - failed < FAILURE_EXPIRY:
+            return True
+        del self.failed[name]
+        return False
+
+    def done(self, name: str, future: Future) -> None:
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning(f"lookup of {name} failed: {e}")
+            failed = True
+        else:
+            failed = False
+            if (cache := self.cache) is not None:
+                try:
+                    cache.put(name, result)
+                except sqlite3.Error as e:
+                    logger.debug(f"failed to cache lookup of {name}: {e}")
+        with self.lock:
+            if self.inflight.get(name) is future:
+                del self.inflight[name]
+            self.prefetching.discard(name)
+            if failed:
+                # Not kept, it's looked up again once the failure expires
+                self.failed[name] = time.monotonic()
+                self.failed.move_to_end(name)
+                if len(self.failed) > RESULTS_SIZE:
+                    self.failed.popitem(last=False)
+            else:
+                self.failed.pop(name, None)
+                self.results[name] = result
+                if len(self.results) > RESULTS_SIZE:
+                    self.results.popitem(last=False)
+        self.ready.put(name)
+
+    def take_missed(self) -> list[str]:
+        missed, self.missed = self.missed, []
+        return missed
+
+    def take_ready(self) -> list[str]:
+        names = []
+        while True:
+            try:
+                names.append(self.ready.get_nowait())
+            except Empty:
+                return names
+
+    @property
+    def stats(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} deduped={self.deduped}"
+            f" in flight={len(self.inflight)} prefetched={self.prefetched}"
+            f" prefetches skipped={self.prefetch_skipped}"
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        if (cache := self.cache) is not None:
+            self.cache = None
+            cache.close()
@@ -0,0 +1,274 @@
+"""
+
+Counters and gauges of the running app, for the Debug tab and for graphing long
+sessions from a Prometheus textfile or JSON file
+
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Callable
+
+import psutil
+
+
+if TYPE_CHECKING:
+    from .windows.main import MainWindow
+
+
+logger = logging.getLogger("all-slain-gui").getChild("metrics")
+
+
+# Label value -> value, or one unlabelled value
+Sample = float | dict[str, float]
+
+
+def escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    __slots__ = ("name", "help", "kind", "label", "collect")
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        kind: str,
+        collect: Callable[[], Sample],
+        label: str = "",
+    ):
+        self.name = name
+        self.help = help_
+        # "counter" or "gauge"
+        self.kind = kind
+        self.collect = collect
+        self.label = label
+
+
+class Rate:
+    """
+    Per second change of a counter between calls, kept apart for each consumer so
+    they don't shorten each other's intervals.
+    """
+
+    def __init__(self, counter: Callable[[], float]):
+        self.counter = counter
+        self.start = (time.monotonic(), counter())
+        # Consumer -> (time, value) it last read
+        self.last: dict[str, tuple[float, float]] = {}
+
+    def __call__(self, consumer: str = "") -> float:
+        now, value = time.monotonic(), self.counter()
+        last_time, last_value = self.last.get(consumer, self.start)
+        self.last[consumer] = (now, value)
+        if now <= last_time or value < last_value:
+            return 0.0
+        return (value - last_value) / (now - last_time)
+
+
+class Registry:
+    """
+    Metrics are read from where they're already counted when collected, so
+    nothing is paid for them in between.
+    """
+
+    def __init__(self, prefix: str = "allslain_"):
+        self.prefix = prefix
+        self.metrics: list[Metric] = []
+
+    def counter(
+        self, name: str, help_: str, collect: Callable[[], Sample], label: str = ""
+    ) -> None:
+        self.metrics.append(
+            Metric(self.prefix + name, help_, "counter", collect, label)
+        )
+
+    def gauge(
+        self, name: str, help_: str, collect: Callable[[], Sample], label: str = ""
+    ) -> None:
+        self.metrics.append(Metric(self.prefix + name, help_, "gauge", collect, label))
+
+    def collect(self, consumer: str = "") -> list[tuple[Metric, Sample]]:
+        """
+        `consumer` names who's reading, for rates since its last read.
+        """
+        samples: list[tuple[Metric, Sample]] = []
+        for metric in self.metrics:
+            collect = metric.collect
+            try:
+                if isinstance(collect, Rate):
+                    samples.append((metric, collect(consumer)))
+                else:
+                    samples.append((metric, collect()))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.debug(f"failed to collect {metric.name}: {e}")
+        return samples
+
+    @staticmethod
+    def lines(metric: Metric, sample: Sample) -> list[tuple[str, float]]:
+        if isinstance(sample, dict):
+            return [
+                (f'{metric.name}{{{metric.label}="{escape(key)}"}}', value)
+                for key, value in sorted(sample.items())
+            ]
+        return [(metric.name, sample)]
+
+    def to_prometheus(self, samples: list[tuple[Metric, Sample]]) -> str:
+        out = []
+        for metric, sample in samples:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(
+                f"{name} {value:g}" for name, value in self.lines(metric, sample)
+            )
+        return "\n".join(out) + "\n"
+
+    def to_dict(self, samples: list[tuple[Metric, Sample]]) -> dict:
+        return {
+            "time": time.time(),
+            **{metric.name: sample for metric, sample in samples},
+        }
+
+    def text(self, samples: list[tuple[Metric, Sample]]) -> str:
+        return "\n".join(
+            f"{name.removeprefix(self.prefix)} {value:,.6g}"
+            for metric, sample in samples
+            for name, value in self.lines(metric, sample)
+        )
+
+    def write(self, path: str) -> None:
+        """
+        As JSON if `path` ends with .json, otherwise as a Prometheus textfile.
+        Replaced whole, so it's never read half written.
+        """
+        samples = self.collect(path)
+        if path.lower().endswith(".json"):
+            text = json.dumps(self.to_dict(samples), indent=2)
+        else:
+            text = self.to_prometheus(samples)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def thread_cpu_times() -> dict[int, float]:
+    """
+    Native thread id -> seconds of CPU time
+    """
+    return {
+        thread.id: thread.user_time + thread.system_time
+        for thread in psutil.Process().threads()
+    }
+
+
+def app_metrics(mw: MainWindow) -> Registry:
+    allslain = mw.app.allslain
+    overlay = mw.overlay
+    registry = Registry()
+
+    def lines_read() -> float:
+        return allslain.follower.lines if allslain.follower else 0
+
+    registry.counter("lines_read_total", "Game.log lines read", lines_read)
+    registry.gauge(
+        "lines_per_second", "Game.log lines read per second", Rate(lines_read)
+    )
+    registry.counter(
+        "events_total",
+        "Events output, by handler",
+        lambda: dict(allslain.events),
+        "handler",
+    )
+    registry.gauge(
+        "log_bytes_behind",
+        "Bytes of Game.log not read yet",
+        lambda: allslain.follower.behind() if allslain.follower else 0,
+    )
+
+    registry.counter(
+        "overlay_repaints_total", "Overlay repaints", lambda: overlay.repaints
+    )
+    registry.counter(
+        "overlay_merged_total",
+        "Overlay updates that shared a repaint",
+        lambda: overlay.merged,
+    )
+    registry.counter(
+        "overlay_dropped_total",
+        "Overlay lines scrolled off before being shown",
+        lambda: overlay.dropped,
+    )
+
+    def webhooks(attr: str) -> Callable[[], dict[str, float]]:
+        # Unnamed ones are named by their url, which has the token in it
+        return lambda: {
+            d.name if d.name != d.dispatcher.url else f"webhook {i}": getattr(
+                d.dispatcher, attr
+            )
+            for i, d in enumerate(allslain.router.destinations, 1)
+        }
+
+    registry.gauge(
+        "webhook_queue_depth",
+        "Webhook events waiting to be sent",
+        webhooks("depth"),
+        "destination",
+    )
+    registry.counter(
+        "webhook_sent_total", "Webhook messages sent", webhooks("sent"), "destination"
+    )
+    registry.counter(
+        "webhook_failures_total",
+        "Webhook messages that failed to send",
+        webhooks("failed"),
+        "destination",
+    )
+    registry.counter(
+        "webhook_dropped_total",
+        "Webhook events dropped with the queue full",
+        webhooks("dropped"),
+        "destination",
+    )
+
+    def cache_stats() -> dict[str, float]:
+        if not (lookup := allslain.lookup) or not (cache := lookup.cache):
+            return {}
+        return {
+            "hit": cache.hits,
+            "not_found": cache.negative_hits,
+            "miss": cache.misses,
+        }
+
+    def cache_hit_ratio() -> float:
+        stats = cache_stats()
+        lookups = sum(stats.values())
+        return (stats["hit"] + stats["not_found"]) / lookups if lookups else 0.0
+
+    registry.counter(
+        "lookup_cache_total", "Lookup cache reads, by result", cache_stats, "result"
+    )
+    registry.gauge(
+        "lookup_cache_hit_ratio", "Lookup cache reads that hit", cache_hit_ratio
+    )
+
+    def cpu_seconds() -> dict[str, float]:
+        times = thread_cpu_times()
+        return {
+            "main": time.thread_time(),
+            # The last seen once the thread has finished
+            **{
+                thread.objectName(): times.get(thread.native_id, thread.cpu_time)
+                for thread in (allslain, mw.uc)
+            },
+        }
+
+    registry.counter(
+        "thread_cpu_seconds_total", "CPU time, by thread", cpu_seconds, "thread"
+    )
+    return registry
@@ -0,0 +1,102 @@
+"""
+
+Webhook messages that have not been delivered yet, kept on disk so they survive
+crashes, restarts and network outages
+
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from typing import Sequence
+
+from allslain.config import executable_path
+
+
+OUTBOX_NAME = f"{executable_path()}/allslain_gui.outbox.sqlite3"
+
+# Seconds. Kill reports older than this aren't worth sending anymore.
+MAX_AGE = 24 * 60 * 60
+
+
+logger = logging.getLogger("all-slain-gui").getChild("outbox")
+
+
+class Outbox:
+    """
+    The messages for one webhook. Connections can't be shared between threads, so
+    this is created on the thread that uses it.
+    """
+
+    def __init__(self, url: str, path: str = OUTBOX_NAME):
+        self.url = url
+        self.db = sqlite3.connect(path, timeout=5)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL survives application crashes, only an OS
+        # crash can lose the last commits.
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY, "
+                "url TEXT NOT NULL, "
+                "text TEXT NOT NULL, "
+                "created REAL NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+            expired = self.db.execute(
+                "DELETE FROM outbox WHERE created < ?", (time.time() - MAX_AGE,)
+            ).rowcount
+        if expired:
+            logger.info(f"dropped {expired} expired messages")
+        self.pending = self.db.execute(
+            "SELECT COUNT(*) FROM outbox WHERE url = ?", (url,)
+        ).fetchone()[0]
+        if self.pending:
+            logger.info(f"{self.pending} messages left over for {url}")
+
+    def add(self, texts: list[str]) -> None:
+        """
+        Stores a batch of messages in a single commit.
+        """
+        if not texts:
+            return
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO outbox (url, text, created) VALUES (?, ?, ?)",
+                ((self.url, text, now) for text in texts),
+            )
+        self.pending += len(texts)
+
+    def next(self, limit: int) -> list[tuple[int, str, float]]:
+        return self.db.execute(
+            "SELECT id, text, created FROM outbox WHERE url = ? ORDER BY id LIMIT ?",
+            (self.url, limit),
+        ).fetchall()
+
+    def oldest(self) -> float:
+        row = self.db.execute(
+            "SELECT created FROM outbox WHERE url = ? ORDER BY id LIMIT 1",
+            (self.url,),
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def done(self, ids: Sequence[int]) -> None:
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM outbox WHERE id = ?", ((id_,) for id_ in ids)
+            )
+        self.pending -= len(ids)
+
+    def failed(self, ids: Sequence[int]) -> None:
+        with self.db:
+            self.db.executemany(
+                "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                ((id_,) for id_ in ids),
+            )
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,68 @@
+"""
+
+Player names picked out of Game.log lines as they're read, to look them up
+before they're in a kill
+
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+
+if TYPE_CHECKING:
+    from .lookup import AsyncLookup
+
+
+# Quoted names with an id in spawn, corpse, vehicle and party lines, e.g.
+#   Player 'Name' [201990621234]
+#   destroyed by 'Name' [201990621234]
+QUOTED = re.compile(r"(?:Player|Actor|[Bb]y|[Mm]ember) '([\w-]{3,60})' \[\d")
+# The login line
+#   name Name - state STATE_CURRENT
+LOGIN = re.compile(r"\bname ([\w-]{3,60}) - state")
+
+# NPCs, which aren't worth looking up
+NPC = re.compile(r"^(?:PU_|NPC_|AIModule_|Kopion_|Quasi)|_\d{6,}$")
+
+# Names remembered as seen, cleared when full
+SEEN_SIZE = 10_000
+
+
+class Prefetcher:
+    """
+    `enabled` is checked as names are found. The app turns it off while reading
+    the backlog, whose players are mostly long gone.
+    """
+
+    def __init__(self, lookup: AsyncLookup, enabled: Callable[[], bool]):
+        self.lookup = lookup
+        self.enabled = enabled
+        self.seen: set[str] = set()
+
+    def scan(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Passes lines through, prefetching the player names in them.
+        """
+        findall = QUOTED.findall
+        for line in lines:
+            # Cheaper than running the patterns on every line
+            if "' [" in line:
+                self.add(findall(line))
+            elif " - state " in line and (match := LOGIN.search(line)):
+                self.add((match[1],))
+            yield line
+
+    def add(self, names: Iterable[str]) -> None:
+        # Not marked seen while disabled, so they're prefetched once enabled
+        if not self.enabled():
+            return
+        for name in names:
+            if name in self.seen:
+                continue
+            if len(self.seen) >= SEEN_SIZE:
+                self.seen.clear()
+            self.seen.add(name)
+            if NPC.search(name) is None:
+                self.lookup.prefetch(name)
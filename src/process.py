@@ -0,0 +1,95 @@
+"""
+
+Finding the game's process, and noticing when it exits
+
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable
+
+from psutil import NoSuchProcess, Process, process_iter
+
+
+logger = logging.getLogger("all-slain-gui").getChild("process")
+
+
+# Seconds between scans for the game while it isn't running, growing by
+# SCAN_BACKOFF after each scan
+SCAN_INTERVAL_MIN = 1.0
+SCAN_INTERVAL_MAX = 5.0
+SCAN_BACKOFF = 1.5
+
+# Seconds between checks for stopping while waiting to scan again
+STOP_CHECK_INTERVAL = 0.25
+
+
+def find_process(name: str) -> Process | None:
+    # Only the name is read from every process, exe costs more
+    return next(
+        (proc for proc in process_iter(attrs=["name"]) if proc.info["name"] == name),
+        None,
+    )
+
+
+class ProcessWatcher:
+    """
+    Scans for a process by name until it's found, then only watches that one.
+    Its exit is waited for on a helper thread instead of polled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.proc: Process | None = None
+        self.exe: str | None = None
+        self.exited = threading.Event()
+        self.scans = 0
+
+    @property
+    def running(self) -> bool:
+        return self.proc is not None and not self.exited.is_set()
+
+    def scan(self) -> Process | None:
+        self.scans += 1
+        proc = find_process(self.name)
+        if proc is None:
+            return None
+        try:
+            self.exe = proc.exe()
+        except NoSuchProcess:
+            return None
+        self.proc = proc
+        self.exited.clear()
+        threading.Thread(
+            target=self.watch, args=(proc,), name="ProcessWatcher", daemon=True
+        ).start()
+        logger.debug(f"found {self.name} pid {proc.pid}")
+        return proc
+
+    def watch(self, proc: Process) -> None:
+        try:
+            proc.wait()
+        except NoSuchProcess:
+            pass
+        logger.debug(f"{self.name} pid {proc.pid} exited")
+        if proc is self.proc:
+            self.exited.set()
+
+    def wait_started(
+        self, stopped: Callable[[], bool], sleep: Callable[[float], None]
+    ) -> Process | None:
+        """
+        Scans until the process is found, or `stopped`.
+        """
+        interval = SCAN_INTERVAL_MIN
+        while not stopped():
+            if (proc := self.scan()) is not None:
+                return proc
+            remaining = interval
+            while remaining > 0 and not stopped():
+                sleep(min(remaining, STOP_CHECK_INTERVAL))
+                remaining -= STOP_CHECK_INTERVAL
+            interval = min(interval * SCAN_BACKOFF, SCAN_INTERVAL_MAX)
+        return None
@@ -0,0 +1,166 @@
+"""
+
+A sampling profiler for the GUI and AllSlain threads, saving collapsed stacks
+for flame graphs and pstats for snakeviz and the like
+
+"""
+
+from __future__ import annotations
+
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType
+from typing import Callable
+
+from allslain.config import executable_path
+
+
+PROFILE_DIR = f"{executable_path()}/profiles"
+
+# Seconds between samples
+SAMPLE_INTERVAL = 0.005
+
+
+logger = logging.getLogger("all-slain-gui").getChild("profiling")
+
+
+# pstats' key of a function
+Func = tuple[str, int, str]
+
+
+def func(code: CodeType) -> Func:
+    return code.co_filename, code.co_firstlineno, code.co_qualname
+
+
+def frame_label(code: CodeType) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of some threads from a thread of its own, so the threads
+    profiled only pay for giving up the GIL a little more often.
+    """
+
+    def __init__(
+        self,
+        threads: Callable[[], dict[int, str]],
+        interval: float = SAMPLE_INTERVAL,
+    ):
+        """
+        `threads` returns the threading.get_ident() of each thread to sample,
+        and its name.
+        """
+        self.threads = threads
+        self.interval = interval
+        # (thread name, stack from the outermost frame) -> samples
+        self.stacks: Counter[tuple[str, tuple[CodeType, ...]]] = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.stopped = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.started = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="Profiler", daemon=True)
+        self._thread.start()
+        logger.info("profiling started")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stopped = time.monotonic()
+        logger.info(f"profiling stopped, {self.samples} samples")
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frames = sys._current_frames()  # pylint: disable=protected-access
+        for ident, name in self.threads().items():
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[(name, tuple(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """
+        One line per stack, as flamegraph.pl and speedscope read them
+        """
+        return "".join(
+            f"{name};{';'.join(map(frame_label, stack))} {count}\n"
+            for (name, stack), count in self.stacks.most_common()
+        )
+
+    def pstats(self, thread: str) -> dict:
+        """
+        Stats of one thread, as pstats.Stats loads them. Calls are the samples a
+        function was in.
+        """
+        seconds = (self.stopped - self.started) / self.samples if self.samples else 0.0
+        inline: Counter[Func] = Counter()
+        cumulative: Counter[Func] = Counter()
+        callers: dict[Func, Counter[Func]] = {}
+        for (name, stack), count in self.stacks.items():
+            if name != thread:
+                continue
+            funcs = list(map(func, stack))
+            inline[funcs[-1]] += count
+            # Once per stack, however deep it recurses
+            for f in set(funcs):
+                cumulative[f] += count
+            for caller, callee in set(zip(funcs, funcs[1:])):
+                callers.setdefault(callee, Counter())[caller] += count
+        return {
+            f: (
+                count,
+                count,
+                inline[f] * seconds,
+                count * seconds,
+                dict(callers.get(f, {})),
+            )
+            for f, count in cumulative.items()
+        }
+
+    def save(self, directory: str = PROFILE_DIR) -> list[str]:
+        """
+        Saves the collapsed stacks of every thread, and the pstats of each.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(
+            directory, time.strftime("allslain_gui-%Y%m%d-%H%M%S", time.localtime())
+        )
+        paths = [f"{base}.collapsed"]
+        with open(paths[0], "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        for thread in sorted({name for name, _ in self.stacks}):
+            path = f"{base}-{thread}.pstats"
+            with open(path, "wb") as fb:
+                marshal.dump(self.pstats(thread), fb)
+            paths.append(path)
+        logger.info(f"saved profile to {base}*")
+        return paths
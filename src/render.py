@@ -0,0 +1,225 @@
+"""
+
+Events are formatted once into a marked up string, then rendered for each
+output as needed
+
+"""
+
+from __future__ import annotations
+
+import re
+from enum import IntEnum, auto
+from functools import lru_cache
+from struct import pack
+from typing import NamedTuple
+
+from allslain.colorize import Color
+
+
+COLOR_MAP = {
+    "BLACK": "#0C0C0C",
+    "RED": "#C50F1F",
+    "GREEN": "#13A10D",
+    "YELLOW": "#C19C00",
+    "BLUE": "#0037DA",
+    "MAGENTA": "#881798",
+    "CYAN": "#3A96DD",
+    "WHITE": "#CCCCCC",
+}
+
+COLOR_MAP_BOLD = {
+    "BLACK": "#767676",
+    "RED": "#E74856",
+    "GREEN": "#16C60C",
+    "YELLOW": "#E6E600",
+    "BLUE": "#3B78FF",
+    "MAGENTA": "#B4009E",
+    "CYAN": "#61D6D6",
+    "WHITE": "#F2F2F2",
+}
+
+
+HTML_PREFIX = {
+    (name, bold): f'<span style="color: {color}">'
+    for bold, color_map in ((False, COLOR_MAP), (True, COLOR_MAP_BOLD))
+    for name, color in color_map.items()
+}
+
+# Coloured fragments kept rendered. Names of players, ships and orgs repeat a lot.
+HTML_CACHE_SIZE = 4096
+
+
+# Private use characters around coloured text: START style SEP text END
+MARK_START = "\ue000"
+MARK_SEP = "\ue001"
+MARK_END = "\ue002"
+
+MARKS = re.compile(f"([{MARK_START}{MARK_END}])")
+
+
+class OutputType(IntEnum):
+    ANSI = auto()
+    HTML = auto()
+    PLAIN = auto()
+
+
+class SegmentType(IntEnum):
+    TEXT = auto()
+    # One of Color's named colours
+    COLOR = auto()
+    RGB = auto()
+
+
+class Segment(NamedTuple):
+    type: SegmentType
+    text: str
+    # Color member name, or #rrggbb for RGB
+    color: str = ""
+    bold: bool = False
+
+
+def color_mark__call__(
+    self: Color, text: object, bold: bool = False, bg=None, bg_bold: bool = False
+) -> str:
+    return f"{MARK_START}{'B' if bold else 'N'}{self.name}{MARK_SEP}{text}{MARK_END}"
+
+
+@lru_cache(maxsize=256)
+def rgb_hex(fg: tuple[int, int, int]) -> str:
+    return pack("BBB", *fg).hex()
+
+
+def color_mark_rgb(
+    fg: tuple[int, int, int] | None = None,
+    bg: tuple[int, int, int] | None = None,
+    bold: bool = False,
+    text: str = "",
+) -> str:
+    if not fg:
+        return ""
+    return f"{MARK_START}{'B' if bold else 'N'}#{rgb_hex(tuple(fg))}{MARK_SEP}{text}{MARK_END}"
+
+
+color_call_orig = Color.__call__
+color_rgb_orig = Color.rgb
+
+Color.__call__ = color_mark__call__
+Color.rgb = color_mark_rgb
+
+
+def parse(marked: str) -> list[Segment]:
+    segments: list[Segment] = []
+    # Styles of the enclosing coloured text, innermost last
+    styles: list[str] = []
+    for part in MARKS.split(marked):
+        if part == MARK_START:
+            continue
+        if part == MARK_END:
+            if styles:
+                styles.pop()
+            continue
+        if not part:
+            continue
+        if MARK_SEP in part:
+            style, part = part.split(MARK_SEP, 1)
+            styles.append(style)
+            if not part:
+                continue
+        if not styles:
+            segments.append(Segment(SegmentType.TEXT, part))
+            continue
+        style = styles[-1]
+        bold = style[0] == "B"
+        if style[1] == "#":
+            segments.append(Segment(SegmentType.RGB, part, style[1:], bold))
+        else:
+            segments.append(Segment(SegmentType.COLOR, part, style[1:], bold))
+    return segments
+
+
+def render_html(segment: Segment) -> str:
+    if segment.type == SegmentType.TEXT:
+        return segment.text
+    return html_span(segment.color, segment.bold, segment.text)
+
+
+@lru_cache(maxsize=HTML_CACHE_SIZE)
+def html_span(color: str, bold: bool, text: str) -> str:
+    prefix = HTML_PREFIX.get((color, bold)) or f'<span style="color: {color}">'
+    return f'{prefix}{text.replace(" ", "&nbsp;")}</span>'
+
+
+def html_cache_stats() -> str:
+    info = html_span.cache_info()
+    lookups = info.hits + info.misses
+    hit_rate = info.hits / lookups if lookups else 0.0
+    return f"hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize} hit rate={hit_rate:.1%}"
+
+
+def render_ansi(segment: Segment) -> str:
+    if segment.type == SegmentType.TEXT:
+        return segment.text
+    if segment.type == SegmentType.RGB:
+        return color_rgb_orig(
+            fg=tuple(bytes.fromhex(segment.color[1:])),
+            bold=segment.bold,
+            text=segment.text,
+        )
+    return color_call_orig(Color[segment.color], segment.text, bold=segment.bold)
+
+
+def render_plain(segment: Segment) -> str:
+    return segment.text
+
+
+RENDERERS = {
+    OutputType.ANSI: render_ansi,
+    OutputType.HTML: render_html,
+    OutputType.PLAIN: render_plain,
+}
+
+
+class Event:
+    """
+    A formatted event, rendered for each output type at most once.
+    """
+
+    __slots__ = ("type", "marked", "_segments", "_rendered")
+
+    def __init__(self, type_: str, marked: str):
+        # Handler name
+        self.type = type_
+        self.marked = marked
+        self._segments: list[Segment] | None = None
+        self._rendered: dict[OutputType, str] = {}
+
+    @property
+    def segments(self) -> list[Segment]:
+        if self._segments is None:
+            self._segments = parse(self.marked)
+        return self._segments
+
+    def render(self, output_type: OutputType) -> str:
+        try:
+            return self._rendered[output_type]
+        except KeyError:
+            pass
+        if MARK_START in self.marked:
+            renderer = RENDERERS[output_type]
+            text = "".join(renderer(segment) for segment in self.segments)
+        else:
+            text = self.marked
+        self._rendered[output_type] = text
+        return text
+
+    @property
+    def html(self) -> str:
+        return self.render(OutputType.HTML)
+
+    @property
+    def ansi(self) -> str:
+        return self.render(OutputType.ANSI)
+
+    @property
+    def plain(self) -> str:
+        return self.render(OutputType.PLAIN)
@@ -0,0 +1,127 @@
+"""
+
+Which events go to which webhooks
+
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import TYPE_CHECKING, Callable
+
+from allslain.handlers.killp import KillP
+from allslain.handlers.killv import KillV
+
+from .discord import WebhookDispatcher
+
+
+if TYPE_CHECKING:
+    from .config import ConfigDocument, WebhookDestination
+    from .render import Event
+
+
+logger = logging.getLogger("all-slain-gui").getChild("routing")
+
+
+# Handlers routed when a destination doesn't list any
+DEFAULT_EVENTS = (KillP.__name__, KillV.__name__)
+
+# (event type, plain text, player name) -> whether to send it
+Rule = Callable[[str, str, str | None], bool]
+
+
+def names_pattern(names: list[str]) -> re.Pattern[str]:
+    """
+    Matches any of the names as a whole word. Handles are case-insensitive.
+    """
+    alternatives = "|".join(re.escape(name) for name in sorted(names, key=len)[::-1])
+    return re.compile(rf"(?<![\w-])(?:{alternatives})(?![\w-])", re.IGNORECASE)
+
+
+def compile_rule(destination: WebhookDestination) -> Rule:
+    checks: list[Rule] = []
+
+    events = frozenset(destination.get("events") or DEFAULT_EVENTS)
+    checks.append(lambda event, text, me: event in events)
+
+    if destination.get("involves_self", True):
+        checks.append(
+            lambda event, text, me: me is not None and me != "" and me in text
+        )
+
+    if players := destination.get("players"):
+        players_search = names_pattern(players).search
+        checks.append(lambda event, text, me: players_search(text) is not None)
+
+    if orgs := destination.get("orgs"):
+        orgs_search = names_pattern(orgs).search
+        checks.append(lambda event, text, me: orgs_search(text) is not None)
+
+    if len(checks) == 1:
+        return checks[0]
+    return lambda event, text, me: all(check(event, text, me) for check in checks)
+
+
+def load_destinations(config: ConfigDocument) -> list[WebhookDestination]:
+    destinations = [
+        d
+        for d in config["discord"]["webhooks"]
+        if d.get("enabled", True) and d.get("url")
+    ]
+    if (
+        config["discord"]["webhook1_enabled"]
+        and config["discord"]["webhook1_info"]["url"]
+        and config["discord"]["webhook1_info"].get("name") is not None
+    ):
+        destinations.insert(
+            0,
+            {
+                "name": config["discord"]["webhook1_info"]["name"],
+                "url": config["discord"]["webhook1_info"]["url"],
+            },
+        )
+    return destinations
+
+
+class Destination:
+    def __init__(self, destination: WebhookDestination, window: float):
+        self.name = destination.get("name") or destination["url"]
+        self.events = frozenset(destination.get("events") or DEFAULT_EVENTS)
+        self.matches = compile_rule(destination)
+        self.dispatcher = WebhookDispatcher(destination["url"], window)
+
+
+class Router:
+    def __init__(self, config: ConfigDocument):
+        self.destinations: list[Destination] = []
+        urls = set()
+        for destination in load_destinations(config):
+            # The outbox is per url
+            if destination["url"] in urls:
+                logger.warning(f"ignoring duplicate webhook {destination['url']}")
+                continue
+            urls.add(destination["url"])
+            self.destinations.append(
+                Destination(destination, config["discord"]["coalesce_window"])
+            )
+
+    @property
+    def events(self) -> frozenset[str]:
+        return frozenset().union(*(d.events for d in self.destinations))
+
+    def dispatch(self, event: Event, player_name: str | None) -> None:
+        for destination in self.destinations:
+            if destination.matches(event.type, event.plain, player_name):
+                destination.dispatcher.post(event.ansi)
+
+    def start(self) -> None:
+        for destination in self.destinations:
+            destination.dispatcher.start()
+
+    def stop(self, timeout: int) -> None:
+        for destination in self.destinations:
+            destination.dispatcher.stop()
+        # Each gets its own deadline, they're stopping at the same time anyway
+        for destination in self.destinations:
+            destination.dispatcher.wait(timeout)
@@ -0,0 +1,298 @@
+"""
+
+An offline org membership snapshot, imported from CSV or JSON and looked up
+instead of a web data provider
+
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import IO, Any, Callable, Iterable, Iterator
+
+from allslain.config import executable_path
+from PyQt6.QtCore import QThread
+from PyQt6.QtCore import pyqtSignal as Signal
+
+
+# Each import is a new version, allslain_gui.snapshot-<version>.sqlite3, as the
+# previous one can be open, which Windows won't replace
+SNAPSHOT_NAME = f"{executable_path()}/allslain_gui.snapshot.sqlite3"
+
+PROVIDER_KEY = "snapshot"
+
+# Rows inserted per transaction while importing
+IMPORT_BATCH = 10_000
+
+# Bytes of JSON read at a time
+JSON_CHUNK = 1 << 16
+
+# Bytes of the snapshot mapped into memory instead of read
+MMAP_SIZE = 256 << 20
+
+# Accepted column names, lowercased
+HANDLE_KEYS = ("handle", "player", "nickname", "name")
+SID_KEYS = ("org", "sid", "org_sid", "orgsid")
+ORG_NAME_KEYS = ("org_name", "orgname", "organization")
+
+# Between the values of a JSON array
+SEPARATORS = re.compile(r"[\s,]*")
+
+
+logger = logging.getLogger("all-slain-gui").getChild("snapshot")
+
+
+# The version last imported, open providers switch to it
+imported: str | None = None
+
+
+def pick(row: dict[str, Any], keys: Iterable[str]) -> str:
+    for key in keys:
+        if value := row.get(key):
+            return str(value).strip()
+    return ""
+
+
+def normalize(rows: Iterable[dict[str, Any]]) -> Iterator[tuple[str, str, str, str]]:
+    for row in rows:
+        row = {str(k).strip().lower(): v for k, v in row.items()}
+        if not (handle := pick(row, HANDLE_KEYS)):
+            continue
+        yield handle.lower(), handle, pick(row, SID_KEYS), pick(row, ORG_NAME_KEYS)
+
+
+def read_json_array(f: IO[str]) -> Iterator[dict[str, Any]]:
+    """
+    Yields the objects of a JSON array one at a time, without reading the whole
+    file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        pos = SEPARATORS.match(buffer, pos).end()  # type: ignore[union-attr]
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Cut off at the end of the chunk
+                if eof:
+                    raise
+            else:
+                if isinstance(value, dict):
+                    yield value
+                continue
+        elif eof:
+            raise ValueError("unterminated JSON array")
+        chunk = f.read(JSON_CHUNK)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def read_rows(path: str) -> Iterator[dict[str, Any]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        start = f.read(1)
+        while start.isspace():
+            start = f.read(1)
+        f.seek(0)
+        if start == "[":
+            yield from read_json_array(f)
+            return
+        # JSON Lines
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def versions(db_path: str = SNAPSHOT_NAME) -> list[tuple[int, str]]:
+    """
+    (version, path) of each imported snapshot, oldest first
+    """
+    root, ext = os.path.splitext(db_path)
+    pattern = re.compile(rf"{re.escape(os.path.basename(root))}-(\d+){re.escape(ext)}")
+    directory = os.path.dirname(db_path) or "."
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(
+        (int(match[1]), os.path.join(directory, name))
+        for name in names
+        if (match := pattern.fullmatch(name))
+    )
+
+
+def latest_snapshot(db_path: str = SNAPSHOT_NAME) -> str | None:
+    return found[-1][1] if (found := versions(db_path)) else None
+
+
+def remove_old(db_path: str = SNAPSHOT_NAME) -> None:
+    """
+    Removes the versions before the latest. One still open is left for next time.
+    """
+    for _, path in versions(db_path)[:-1]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.debug(f"old snapshot not removed: {e}")
+
+
+def import_snapshot(
+    path: str,
+    db_path: str = SNAPSHOT_NAME,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Imports into a new version that's switched to once complete, so a failed
+    import leaves the previous snapshot.
+    """
+    global imported  # pylint: disable=global-statement
+    root, ext = os.path.splitext(db_path)
+    found = versions(db_path)
+    new = f"{root}-{found[-1][0] + 1 if found else 1}{ext}"
+    tmp = f"{new}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    count = 0
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute(
+            "CREATE TABLE players ("
+            "handle_lower TEXT PRIMARY KEY, "
+            "handle TEXT NOT NULL, "
+            "sid TEXT NOT NULL, "
+            "org_name TEXT NOT NULL) WITHOUT ROWID"
+        )
+        db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+        rows = normalize(read_rows(path))
+        while batch := [row for _, row in zip(range(IMPORT_BATCH), rows)]:
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?)", batch
+                )
+            count += len(batch)
+            if progress:
+                progress(count)
+        with db:
+            db.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                (
+                    ("source", os.path.basename(path)),
+                    ("imported", time.time()),
+                    ("rows", count),
+                ),
+            )
+        db.close()
+        os.replace(tmp, new)
+    except BaseException:
+        db.close()
+        os.remove(tmp)
+        raise
+    imported = new
+    remove_old(db_path)
+    logger.info(f"imported {count} players from {path}")
+    return count
+
+
+def snapshot_info(db_path: str = SNAPSHOT_NAME) -> dict[str, Any]:
+    if (path := latest_snapshot(db_path)) is None:
+        return {}
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+        return dict(db.execute("SELECT key, value FROM meta").fetchall())
+
+
+def make_player(handle: str, sid: str, org_name: str) -> Any:
+    # What allslain's data providers return
+    from allslain.data_providers import Org, Player
+
+    return Player(handle, Org(sid, org_name) if sid else None)
+
+
+class SnapshotProvider:
+    """
+    Looks players up in the snapshot. The database is paged in by SQLite as it's
+    used, not loaded at startup.
+    """
+
+    def __init__(self, db_path: str = SNAPSHOT_NAME):
+        self.db_path = db_path
+        if (path := latest_snapshot(db_path)) is None:
+            raise sqlite3.OperationalError("no snapshot imported")
+        self.path = path
+        self.db = self.open(path)
+
+    @staticmethod
+    def open(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        db.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        return db
+
+    def switch(self, path: str) -> None:
+        try:
+            db = self.open(path)
+        except sqlite3.Error as e:
+            logger.warning(f"failed to open the new snapshot: {e}")
+            return
+        finally:
+            # Tried once
+            self.path = path
+        self.db.close()
+        self.db = db
+        logger.info(f"switched to snapshot {os.path.basename(path)}")
+        remove_old(self.db_path)
+
+    def lookup_player(self, name: str, *args, **kwargs) -> Any:
+        if imported is not None and imported != self.path:
+            self.switch(imported)
+        row = self.db.execute(
+            "SELECT handle, sid, org_name FROM players WHERE handle_lower = ?",
+            (name.lower(),),
+        ).fetchone()
+        if row is None:
+            return None
+        return make_player(*row)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SnapshotImport(QThread):
+    progress = Signal(int)
+    # Rows imported, or an error message
+    result = Signal(object)
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.setObjectName("SnapshotImport")
+        self.path = path
+
+    def run(self):
+        try:
+            count = import_snapshot(self.path, progress=self.progress.emit)
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            logger.warning(f"snapshot import failed: {e}")
+            self.result.emit(str(e))
+            return
+        self.result.emit(count)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+
+
+class LatencyStats:
+    """
+    Durations in seconds.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"n={self.count} last={self.last * 1000:.1f}ms "
+            f"mean={self.mean * 1000:.1f}ms max={self.max * 1000:.1f}ms"
+        )
+
+
+# Smallest bucket, and buckets per doubling
+HISTOGRAM_MIN = 10e-6
+HISTOGRAM_STEPS = 4
+
+
+class Histogram(LatencyStats):
+    """
+    Durations in seconds, counted in logarithmic buckets so percentiles don't
+    need every sample kept. They're the upper bound of their bucket, at most 19%
+    high.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buckets: dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        super().add(seconds)
+        bucket = (
+            max(0, math.ceil(math.log2(seconds / HISTOGRAM_MIN) * HISTOGRAM_STEPS))
+            if seconds > HISTOGRAM_MIN
+            else 0
+        )
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @staticmethod
+    def bound(bucket: int) -> float:
+        return HISTOGRAM_MIN * 2 ** (bucket / HISTOGRAM_STEPS)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.bound(bucket), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            # Upper bound -> count
+            "buckets": {
+                f"{self.bound(bucket):.6g}": self.buckets[bucket]
+                for bucket in sorted(self.buckets)
+            },
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"n={self.count} p50={self.quantile(0.5) * 1000:.1f}ms"
+            f" p95={self.quantile(0.95) * 1000:.1f}ms"
+            f" p99={self.quantile(0.99) * 1000:.1f}ms max={self.max * 1000:.1f}ms"
+        )
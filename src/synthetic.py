@@ -0,0 +1,398 @@
+"""
+
+Synthetic Game.log content for load testing, written all at once or appended
+live next to a stand-in for the game's process
+
+    python -m src.synthetic generate Game.log --lines 1000000
+    python -m src.synthetic live /tmp/sc --rate 20 --burst 500 --burst-interval 30
+
+With live, run the debug build (GAME_EXE is mpv.exe) and it finds the stand-in
+at /tmp/sc/Bin64/mpv.exe, then follows /tmp/sc/Game.log.
+
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import random
+import shutil
+import subprocess
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Callable, Iterator
+
+
+# Relative frequency of each kind of line
+DEFAULT_MIX = {
+    "kill": 3,
+    "vehicle": 3,
+    "spawn": 2,
+    "loading": 1,
+    "join": 1,
+    "noise": 90,
+}
+
+# Seconds between appends while writing live
+TICK = 0.05
+
+# Lines per second of game time in a generated log
+BACKLOG_RATE = 5
+
+SHIPS = (
+    "ANVL_Arrow",
+    "AEGS_Gladius",
+    "AEGS_Avenger_Titan",
+    "RSI_Aurora_MR",
+    "DRAK_Cutlass_Black",
+    "MISC_Freelancer",
+    "CRUS_Starfighter_Ion",
+    "ORIG_300i",
+)
+WEAPONS = (
+    "KLWE_LaserRepeater_S3",
+    "BEHR_BallisticGatling_S4",
+    "GATS_BallisticCannon_S3",
+    "behr_rifle_ballistic_01",
+    "ksar_pistol_energy_01",
+    "gmni_lmg_energy_01",
+)
+DAMAGE_TYPES = ("Bullet", "VehicleDestruction", "Crash", "Explosion", "Suicide")
+ZONES = (
+    "OOC_Stanton_2b_Daymar",
+    "OOC_Stanton_1_Hurston",
+    "OOC_Stanton_3a_Lyria",
+    "Stanton4_Microtech",
+    "RR_CRU_LEO",
+)
+SPAWNPOINTS = ("Bed", "MedBay", "Hospital_Bed_Orison")
+NPCS = (
+    "PU_Human_Enemy_GroundCombat_NPC_Pirate_Light",
+    "PU_Pilots-Human-Criminal-Gunship",
+    "NPC_Archetypes-Male-Human-security",
+    "Kopion_Legacy",
+)
+SYLLABLES = (
+    "ka", "zer", "vo", "lin", "dra", "mo", "ta", "rix", "sen", "qu",
+    "el", "thor", "pi", "nok", "va", "ul", "jin", "fe", "gor", "ash",
+)  # fmt: skip
+
+NOISE = (
+    '[Notice] <UpdateNotificationItem> Notification "Entered Monitored Space"'
+    " [{n}], Action: Unknown, Type: Warning [Team_CoreGameplayFeatures][Missions]",
+    "[Notice] <Corpse> Player '{player}' <remote client>: Running IsCorpseEnabled"
+    " check [Team_ActorTech][Actor]",
+    "[Trace] <CEntityComponentInstancedInterior::OnEntityLeaveZone> [{n}]"
+    " [Team_CGP3][InstancedInterior]",
+    "[Notice] <Physics> CPhysicalWorld::RayWorldIntersection: {n} rays"
+    " [Team_Physics][Physics]",
+    "[Notice] <FatalCollision> Fatal Collision occured for vehicle {ship}"
+    " [Team_VehicleFeatures][Vehicle]",
+    "[Notice] <Actor State Dead> Actor '{npc}_{id}' [{id}] ejected from zone"
+    " '{zone}' [Team_ActorTech][Actor]",
+    "Loading platform manager: Area={zone} [Team_Game][Loading]",
+)
+
+
+def player_names(count: int, rng: random.Random) -> list[str]:
+    """
+    `count` distinct handles
+    """
+    names: set[str] = set()
+    while len(names) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.5:
+            name += str(rng.randint(0, 999))
+        names.add(name.capitalize() if rng.random() < 0.5 else name)
+    return sorted(names)
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """
+    "kill=5,noise=50" over the default mix
+    """
+    mix: dict[str, float] = dict(DEFAULT_MIX)
+    for item in filter(None, text.split(",")):
+        kind, _, weight = item.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"unknown line kind {kind}, one of {', '.join(mix)}")
+        mix[kind] = float(weight)
+    return mix
+
+
+class SyntheticLog:
+    """
+    Lines shaped like the game's, for allslain's handlers. Timestamps come from
+    `clock`, in seconds since the epoch.
+    """
+
+    def __init__(
+        self,
+        players: int = 1000,
+        mix: dict[str, float] | None = None,
+        seed: int | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.rng = random.Random(seed)
+        self.players = player_names(players, self.rng)
+        self.player_ids = {
+            name: self.rng.randrange(200_000_000_000, 210_000_000_000)
+            for name in self.players
+        }
+        self.me = self.players[0]
+        weights: dict[str, float] = mix if mix is not None else dict(DEFAULT_MIX)
+        self.kinds = [kind for kind, weight in weights.items() if weight > 0]
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.clock = clock
+        self.makers: dict[str, Callable[[], str]] = {
+            "kill": self.kill,
+            "vehicle": self.vehicle,
+            "spawn": self.spawn,
+            "loading": self.loading,
+            "join": self.join,
+            "noise": self.noise,
+        }
+
+    def timestamp(self) -> str:
+        now = self.clock()
+        return (
+            time.strftime("<%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+            + f".{int(now % 1 * 1000):03}Z>"
+        )
+
+    def player(self) -> str:
+        return self.rng.choice(self.players)
+
+    def entity_id(self) -> int:
+        return self.rng.randrange(100_000_000_000, 999_999_999_999)
+
+    def ship(self) -> str:
+        return f"{self.rng.choice(SHIPS)}_{self.entity_id()}"
+
+    def header(self) -> Iterator[str]:
+        yield f"{self.timestamp()} Log started on {time.ctime(self.clock())}"
+        yield (
+            f"{self.timestamp()} [Notice] <AccountLoginCharacterStatus_Character>"
+            f" Character: createdAt 1700000000000 - updatedAt 1700000000000"
+            f" - geid {self.player_ids[self.me]} - accountId 1234567"
+            f" - name {self.me} - state STATE_CURRENT [Team_GameServices][Login]"
+        )
+
+    def kill(self) -> str:
+        victim, killer = self.player(), self.player()
+        roll = self.rng.random()
+        if roll < 0.2:
+            victim = f"{self.rng.choice(NPCS)}_{self.entity_id()}"
+        elif roll < 0.3:
+            killer = f"{self.rng.choice(NPCS)}_{self.entity_id()}"
+        elif roll < 0.35:
+            killer = victim
+        damage_type = "Suicide" if killer == victim else self.rng.choice(DAMAGE_TYPES)
+        weapon = self.rng.choice(WEAPONS)
+        return (
+            f"[Notice] <Actor Death> CActor::Kill: '{victim}'"
+            f" [{self.player_ids.get(victim) or self.entity_id()}]"
+            f" in zone '{self.rng.choice((self.ship(), self.rng.choice(ZONES)))}'"
+            f" killed by '{killer}'"
+            f" [{self.player_ids.get(killer) or self.entity_id()}]"
+            f" using '{weapon}_{self.entity_id()}' [Class {weapon}]"
+            f" with damage type '{damage_type}' from direction"
+            " x: 0.000000, y: 0.000000, z: 0.000000 [Team_ActorTech][Actor]"
+        )
+
+    def vehicle(self) -> str:
+        pilot, attacker = self.player(), self.player()
+        level = self.rng.randint(0, 1)
+        return (
+            f"[Notice] <Vehicle Destruction> CVehicle::OnAdvanceDestroyLevel:"
+            f" Vehicle '{self.ship()}' [{self.entity_id()}]"
+            f" in zone '{self.rng.choice(ZONES)}'"
+            " [pos x: 1.000000, y: 2.000000, z: 3.000000"
+            " vel x: 0.000000, y: 0.000000, z: 0.000000]"
+            f" driven by '{pilot}' [{self.player_ids[pilot]}]"
+            f" advanced from destroy level {level} to {level + 1}"
+            f" caused by '{attacker}' [{self.player_ids[attacker]}]"
+            " with 'Combat' [Team_VehicleFeatures][Vehicle]"
+        )
+
+    def spawn(self) -> str:
+        player = self.player()
+        return (
+            "[Notice] <Spawn Flow> CSCPlayerPUSpawningComponent::UnregisterFromExternalSystems:"
+            f" Player '{player}' [{self.player_ids[player]}] lost reservation for"
+            f" spawnpoint {self.rng.choice(SPAWNPOINTS)} [{self.entity_id()}]"
+            f" at location {self.rng.randint(1, 100)} [Team_ActorFeatures][Spawn]"
+        )
+
+    def loading(self) -> str:
+        return (
+            "Loading screen for pu : SC_Default closed after"
+            f" {self.rng.uniform(5, 120):.2f} seconds"
+        )
+
+    def join(self) -> str:
+        return (
+            f"[Notice] <Join PU> address[10.0.{self.rng.randint(0, 255)}.1]"
+            f" port[64300] shard[pub_euw1b_{self.entity_id()}_100]"
+            f" locationId[{self.entity_id()}] [Team_GameServices][Session][Join]"
+        )
+
+    def noise(self) -> str:
+        return self.rng.choice(NOISE).format(
+            n=self.rng.randint(0, 1_000_000),
+            player=self.player(),
+            ship=self.ship(),
+            npc=self.rng.choice(NPCS),
+            id=self.entity_id(),
+            zone=self.rng.choice(ZONES),
+        )
+
+    def lines(self, count: int) -> Iterator[str]:
+        makers = [self.makers[kind] for kind in self.kinds]
+        for maker in self.rng.choices(makers, self.weights, k=count):
+            yield f"{self.timestamp()} {maker()}"
+
+
+def generate(path: str, count: int, log: SyntheticLog) -> None:
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in log.header():
+            f.write(f"{line}\n")
+        for line in log.lines(count):
+            f.write(f"{line}\n")
+
+
+def start_stand_in(root: str, exe: str) -> subprocess.Popen:
+    """
+    Starts a process named `exe` from `root`/Bin64, where the app finds the game,
+    so it reads `root`/Game.log.
+    """
+    sleep = shutil.which("sleep")
+    if sleep is None:
+        raise RuntimeError("no sleep executable to stand in for the game")
+    bin64 = os.path.join(root, "Bin64")
+    os.makedirs(bin64, exist_ok=True)
+    path = os.path.join(bin64, exe)
+    shutil.copy2(sleep, path)
+    return subprocess.Popen([path, "infinity"])
+
+
+class LiveWriter:
+    """
+    Appends `rate` lines a second, and every `burst_interval` seconds `burst`
+    lines at once.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        log: SyntheticLog,
+        rate: float,
+        burst: int = 0,
+        burst_interval: float = 0.0,
+    ):
+        self.path = path
+        self.log = log
+        self.rate = rate
+        self.burst = burst
+        self.burst_interval = burst_interval
+        self.written = 0
+
+    def run(self, duration: float | None = None) -> None:
+        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+            self.write(f, list(self.log.header()))
+            start = time.monotonic()
+            next_burst = start + self.burst_interval
+            steady = 0
+            while duration is None or time.monotonic() - start < duration:
+                now = time.monotonic()
+                due = int((now - start) * self.rate) - steady
+                steady += due
+                if self.burst and self.burst_interval and now >= next_burst:
+                    due += self.burst
+                    next_burst += self.burst_interval
+                if due:
+                    self.write(f, list(self.log.lines(due)))
+                time.sleep(TICK)
+
+    def write(self, f, lines: list[str]) -> None:
+        f.write("".join(f"{line}\n" for line in lines))
+        f.flush()
+        self.written += len(lines)
+
+
+def cmd_generate(args: Namespace) -> None:
+    log = SyntheticLog(args.players, parse_mix(args.mix), args.seed)
+    # A backlog, a few lines a second ending now
+    start = time.time() - args.lines / BACKLOG_RATE
+    lines = itertools.count()
+    log.clock = lambda: start + next(lines) / BACKLOG_RATE
+    started = time.perf_counter()
+    generate(args.file, args.lines, log)
+    print(
+        f"{args.file}: {args.lines:,} lines, {os.path.getsize(args.file) / 1e6:,.0f} MB"
+        f" in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def cmd_live(args: Namespace) -> None:
+    from .allslain_patch import GAME_EXE
+
+    log = SyntheticLog(args.players, parse_mix(args.mix), args.seed)
+    game = start_stand_in(args.root, args.exe or GAME_EXE)
+    print(f"{args.exe or GAME_EXE} started, pid {game.pid}")
+    writer = LiveWriter(
+        os.path.join(args.root, "Game.log"),
+        log,
+        args.rate,
+        args.burst,
+        args.burst_interval,
+    )
+    try:
+        writer.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # The app sees the game exit
+        game.terminate()
+        game.wait()
+        print(f"wrote {writer.written:,} lines")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="synthetic Game.log")
+    parser.add_argument("--players", type=int, default=1000, help="distinct players")
+    parser.add_argument(
+        "--mix",
+        default="",
+        help=f"line kind weights, e.g. kill=5,noise=50. Default: {DEFAULT_MIX}",
+    )
+    parser.add_argument("--seed", type=int, help="random seed, for the same log")
+    subparsers = parser.add_subparsers(required=True)
+
+    gen = subparsers.add_parser("generate", help="write a whole log")
+    gen.add_argument("file", help="Game.log")
+    gen.add_argument("--lines", type=int, default=100_000)
+    gen.set_defaults(func=cmd_generate)
+
+    live = subparsers.add_parser(
+        "live", help="run a stand-in for the game, and append to its Game.log"
+    )
+    live.add_argument("root", help="directory of the stand-in game")
+    live.add_argument("--rate", type=float, default=10, help="lines per second")
+    live.add_argument("--burst", type=int, default=0, help="lines per burst")
+    live.add_argument(
+        "--burst-interval", type=float, default=30, help="seconds between bursts"
+    )
+    live.add_argument("--duration", type=float, help="seconds, default until ^C")
+    live.add_argument("--exe", help="process name, default GAME_EXE")
+    live.set_defaults(func=cmd_live)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+
+Game.log timestamps are UTC, the overlay shows local time
+
+"""
+
+from __future__ import annotations
+
+import time
+from calendar import timegm
+
+
+# Seconds. UTC offsets only change on a quarter hour, so one looked up for a
+# time holds for the rest of its quarter hour.
+OFFSET_STEP = 15 * 60
+
+DAY = 24 * 60 * 60
+
+
+class LocalTime:
+    """
+    Converts "YYYY-MM-DD HH:MM:SS" UTC timestamps, which only ever move forward in
+    a log, without parsing and formatting each through datetime.
+    """
+
+    def __init__(self):
+        self._day = ""
+        self._day_epoch = 0
+        self._offset = 0
+        self._offset_from = 0
+        self._offset_until = 0
+        self._local_day_epoch = -1
+        self._local_day = ""
+        self._last_in = ""
+        self._last_out = ""
+
+    def epoch(self, timestr: str) -> int:
+        day = timestr[:10]
+        if day != self._day:
+            self._day_epoch = timegm(
+                (int(day[:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0, 0, 0, 0)
+            )
+            self._day = day
+        return (
+            self._day_epoch
+            + int(timestr[11:13]) * 3600
+            + int(timestr[14:16]) * 60
+            + int(timestr[17:19])
+        )
+
+    def offset(self, epoch: int) -> int:
+        if not self._offset_from <= epoch < self._offset_until:
+            self._offset = time.localtime(epoch).tm_gmtoff
+            self._offset_from = epoch - epoch % OFFSET_STEP
+            self._offset_until = self._offset_from + OFFSET_STEP
+        return self._offset
+
+    def localize(self, timestr: str) -> str:
+        """
+        Returns the local time as "YYYY-MM-DD HH:MM:SS".
+        """
+        if timestr == self._last_in:
+            return self._last_out
+
+        epoch = self.epoch(timestr)
+        local = epoch + self.offset(epoch)
+        seconds = local % DAY
+        if (day_epoch := local - seconds) != self._local_day_epoch:
+            self._local_day = time.strftime("%Y-%m-%d", time.gmtime(day_epoch))
+            self._local_day_epoch = day_epoch
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+
+        self._last_in = timestr
+        self._last_out = f"{self._local_day} {hours:02}:{minutes:02}:{seconds:02}"
+        return self._last_out
+
+    def age(self, timestr: str) -> float:
+        """
+        Seconds since the timestamp.
+        """
+        return time.time() - self.epoch(timestr)
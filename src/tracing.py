@@ -0,0 +1,102 @@
+"""
+
+How long events take from the game writing their line to the overlay showing
+them, by stage
+
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import deque
+
+from .stats import Histogram
+
+
+logger = logging.getLogger("all-slain-gui").getChild("tracing")
+
+
+STAGES = {
+    "write": "Game.log written to line read, while following",
+    "handle": "line read to Handler.output",
+    "signal": "Handler.output to the GUI thread",
+    "paint": "GUI thread to overlay repaint",
+    "total": "Game.log written, or line read, to overlay repaint",
+}
+
+
+class Trace:
+    __slots__ = ("written", "read", "output", "delivered")
+
+    def __init__(self, written: int, read: int, output: int):
+        # time.time_ns(), written is 0 while reading the backlog
+        self.written = written
+        self.read = read
+        self.output = output
+        self.delivered = 0
+
+
+class Tracer:
+    """
+    Traces are started on the AllSlain thread as events are output, and finished
+    on the GUI thread. Queued signals arrive in order, so each delivery is the
+    oldest trace.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {stage: Histogram() for stage in STAGES}
+        # Output, not yet delivered
+        self.pending: deque[Trace] = deque()
+        # Delivered, not yet painted
+        self.unpainted: list[Trace] = []
+
+    def enable(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.pending.clear()
+        self.unpainted.clear()
+
+    def output(self, written: int, read: int) -> None:
+        self.pending.append(Trace(written, read, time.time_ns()))
+
+    def delivered(self, _=None) -> None:
+        if not self.pending:
+            return
+        trace = self.pending.popleft()
+        trace.delivered = time.time_ns()
+        self.unpainted.append(trace)
+
+    def painted(self) -> None:
+        if not self.unpainted:
+            return
+        now = time.time_ns()
+        stages = self.stages
+        for trace in self.unpainted:
+            if trace.written:
+                stages["write"].add(max(0, trace.read - trace.written) / 1e9)
+            stages["handle"].add((trace.output - trace.read) / 1e9)
+            stages["signal"].add((trace.delivered - trace.output) / 1e9)
+            stages["paint"].add((now - trace.delivered) / 1e9)
+            stages["total"].add((now - (trace.written or trace.read)) / 1e9)
+        self.unpainted.clear()
+
+    def reset(self) -> None:
+        self.stages = {stage: Histogram() for stage in STAGES}
+
+    def to_dict(self) -> dict:
+        return {
+            stage: {"description": STAGES[stage], **histogram.to_dict()}
+            for stage, histogram in self.stages.items()
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logger.info(f"saved latency trace to {path}")
+
+    def __str__(self) -> str:
+        return "\n".join(
+            f"{stage}: {histogram}" for stage, histogram in self.stages.items()
+        )
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from importlib.metadata import version
 from typing import TYPE_CHECKING, cast
 
@@ -24,8 +26,18 @@ class UpdateCheck(QThread):
     def __init__(self):
         super().__init__()
         self.setObjectName("UpdateCheck")
+        # For metrics
+        self.native_id = 0
+        self.cpu_time = 0.0
 
     def run(self):
+        self.native_id = threading.get_native_id()
+        try:
+            self.check()
+        finally:
+            self.cpu_time = time.thread_time()
+
+    def check(self):
         logger.debug("update check started")
         if not __debug__:
             response = get_latest_version("all-slain-gui")
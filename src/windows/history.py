@@ -0,0 +1,464 @@
+"""
+
+Scrollback of every event this session, searchable by name
+
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Iterator, NamedTuple
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    QSize,
+    Qt,
+    QTimer,
+)
+from PyQt6.QtGui import QAbstractTextDocumentLayout, QPainter, QTextDocument
+from PyQt6.QtWidgets import (
+    QApplication,
+    QLabel,
+    QLineEdit,
+    QListView,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..functions import get_icon
+from ..render import SegmentType, parse, render_html, render_plain
+
+
+if TYPE_CHECKING:
+    from ..render import Event
+    from .main import MainWindow
+
+
+logger = logging.getLogger("all-slain-gui").getChild("history")
+
+
+# Events are only added to the view this often, in milliseconds
+FLUSH_INTERVAL = 100
+
+# Milliseconds after the last keypress before searching
+SEARCH_DELAY = 150
+
+TOKENS = re.compile(r"[\w-]+")
+
+
+class Record(NamedTuple):
+    seq: int
+    # Handler name
+    type: str
+    # As formatted, see render.parse
+    marked: str
+
+
+def name_tokens(marked: str) -> set[str]:
+    """
+    Player, org, ship and location names are the coloured parts of an event.
+    """
+    return {
+        token
+        for segment in parse(marked)
+        if segment.type != SegmentType.TEXT
+        for token in TOKENS.findall(segment.text.lower())
+    }
+
+
+class EventHistory:
+    """
+    The last `capacity` events, with an index of the names in them that's kept up
+    to date as they come in.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.records: list[Record | None] = [None] * capacity
+        # seq of the next record
+        self.next_seq = 0
+        # token -> seqs of the records it's in, ascending. Can include evicted
+        # records, and records that were since replaced.
+        self.index: dict[str, list[int]] = {}
+        # The index's keys, sorted for prefix searches. None once a new token
+        # is indexed, sorted again by the next search.
+        self._tokens: list[str] | None = []
+        # seqs of records replaced after they were indexed
+        self.replaced: set[int] = set()
+
+    @property
+    def first_seq(self) -> int:
+        return max(0, self.next_seq - self.capacity)
+
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+
+    def get(self, seq: int) -> Record | None:
+        if not self.first_seq <= seq < self.next_seq:
+            return None
+        return self.records[seq % self.capacity]
+
+    def append(self, type_: str, marked: str) -> int:
+        seq = self.next_seq
+        self.records[seq % self.capacity] = Record(seq, type_, marked)
+        self.next_seq += 1
+        self.add_tokens(seq, marked)
+        if self.next_seq % self.capacity == 0:
+            self.prune()
+        return seq
+
+    def replace(self, index: int, type_: str, marked: str) -> int | None:
+        """
+        Replaces a record counting back from the newest, which is -1.
+        """
+        if not self.next_seq:
+            return self.append(type_, marked)
+        seq = self.next_seq + index
+        if self.get(seq) is None:
+            return None
+        self.records[seq % self.capacity] = Record(seq, type_, marked)
+        self.replaced.add(seq)
+        self.add_tokens(seq, marked)
+        return seq
+
+    def add_tokens(self, seq: int, marked: str) -> None:
+        for token in name_tokens(marked):
+            if (seqs := self.index.get(token)) is None:
+                self.index[token] = [seq]
+                self._tokens = None
+            elif seqs[-1] != seq:
+                seqs.append(seq)
+
+    def prune(self) -> None:
+        """
+        Drops evicted records from the index, once per lap of the buffer.
+        """
+        first = self.first_seq
+        for token, seqs in list(self.index.items()):
+            if seqs[0] >= first:
+                continue
+            del seqs[: bisect_left(seqs, first)]
+            if not seqs:
+                del self.index[token]
+        self._tokens = None
+        self.replaced = {seq for seq in self.replaced if seq >= first}
+
+    @property
+    def tokens(self) -> list[str]:
+        if self._tokens is None:
+            self._tokens = sorted(self.index)
+        return self._tokens
+
+    def prefixed(self, prefix: str) -> Iterator[str]:
+        tokens = self.tokens
+        for i in range(bisect_left(tokens, prefix), len(tokens)):
+            if not tokens[i].startswith(prefix):
+                break
+            yield tokens[i]
+
+    def seqs(self, prefix: str) -> set[int]:
+        first = self.first_seq
+        return {
+            seq
+            for token in self.prefixed(prefix)
+            for seq in self.index[token][bisect_left(self.index[token], first) :]
+        }
+
+    def search(self, query: str) -> list[int]:
+        """
+        seqs of the records with a name starting with each word of the query.
+        """
+        words = TOKENS.findall(query.lower())
+        if not words:
+            return []
+        matches = self.seqs(words[0])
+        for word in words[1:]:
+            if not matches:
+                return []
+            matches &= self.seqs(word)
+        # Replaced records can leave stale tokens behind
+        for seq in matches & self.replaced:
+            record = self.get(seq)
+            if record is None or not self.matches(record, query):
+                matches.discard(seq)
+        return sorted(matches)
+
+    def matches(self, record: Record, query: str) -> bool:
+        tokens = name_tokens(record.marked)
+        return all(
+            any(token.startswith(word) for token in tokens)
+            for word in TOKENS.findall(query.lower())
+        )
+
+
+class HistoryModel(QAbstractListModel):
+    """
+    Rows are either every record in the history, or the search results. New
+    records are picked up by `flush`.
+    """
+
+    def __init__(self, history: EventHistory):
+        super().__init__()
+        self.history = history
+        self.query = ""
+        # Search results, or None for everything
+        self.results: list[int] | None = None
+        # The seqs shown when not searching
+        self.first = 0
+        self.next = 0
+        # seqs of replaced records
+        self.changed: set[int] = set()
+
+    def seq(self, row: int) -> int:
+        if self.results is not None:
+            return self.results[row]
+        return self.first + row
+
+    def rowCount(
+        self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> int:  # pylint: disable=invalid-name
+        if parent.isValid():
+            return 0
+        if self.results is not None:
+            return len(self.results)
+        return self.next - self.first
+
+    def data(
+        self,
+        index: QModelIndex | QPersistentModelIndex,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if not index.isValid():
+            return None
+        record = self.history.get(self.seq(index.row()))
+        if record is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return "".join(render_html(segment) for segment in parse(record.marked))
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return record.type
+        if role == Qt.ItemDataRole.AccessibleTextRole:
+            return "".join(render_plain(segment) for segment in parse(record.marked))
+        return None
+
+    def set_query(self, query: str) -> None:
+        self.beginResetModel()
+        self.query = query.strip()
+        self.results = self.history.search(self.query) if self.query else None
+        self.first = self.history.first_seq
+        self.next = self.history.next_seq
+        self.changed.clear()
+        self.endResetModel()
+
+    def flush(self) -> None:
+        if self.results is not None:
+            self.flush_results()
+            return
+
+        first, next_ = self.history.first_seq, self.history.next_seq
+        if first > self.first:
+            removed = min(first, self.next) - self.first
+            if removed:
+                self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+                self.first += removed
+                self.endRemoveRows()
+            self.first = first
+            self.next = max(self.next, first)
+        for seq in self.changed:
+            if self.first <= seq < self.next:
+                index = self.index(seq - self.first)
+                self.dataChanged.emit(index, index)
+        if next_ > self.next:
+            self.beginInsertRows(
+                QModelIndex(), self.next - self.first, next_ - 1 - self.first
+            )
+            self.next = next_
+            self.endInsertRows()
+        self.changed.clear()
+
+    def flush_results(self) -> None:
+        assert self.results is not None
+        first = self.history.first_seq
+        if self.results and self.results[0] < first:
+            removed = bisect_left(self.results, first)
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            del self.results[:removed]
+            self.endRemoveRows()
+
+        # Replaced records might match now, or not anymore
+        for seq in sorted(self.changed):
+            if not first <= seq < self.next:
+                continue
+            record = self.history.get(seq)
+            match = record is not None and self.history.matches(record, self.query)
+            row = bisect_left(self.results, seq)
+            present = row < len(self.results) and self.results[row] == seq
+            if match and not present:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.results.insert(row, seq)
+                self.endInsertRows()
+            elif present and not match:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.results[row]
+                self.endRemoveRows()
+            elif present:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+        found = [
+            seq
+            for seq in range(max(self.next, first), self.history.next_seq)
+            if (record := self.history.get(seq)) is not None
+            and self.history.matches(record, self.query)
+        ]
+        if found:
+            row = len(self.results)
+            self.beginInsertRows(QModelIndex(), row, row + len(found) - 1)
+            self.results.extend(found)
+            self.endInsertRows()
+        self.next = self.history.next_seq
+        self.changed.clear()
+
+
+class HtmlDelegate(QStyledItemDelegate):
+    """
+    Only visible rows are painted, so they're laid out as they're painted.
+    """
+
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+        self.document = QTextDocument()
+        self.document.setDocumentMargin(2)
+
+    def paint(
+        self,
+        painter: QPainter | None,
+        option: QStyleOptionViewItem,
+        index: QModelIndex,
+    ):
+        if painter is None:
+            return
+        self.initStyleOption(option, index)
+        html = option.text
+        option.text = ""
+        style = option.widget.style() if option.widget else QApplication.style()
+        if style:
+            style.drawControl(
+                QStyle.ControlElement.CE_ItemViewItem, option, painter, option.widget
+            )
+
+        self.document.setDefaultFont(option.font)
+        self.document.setHtml(html)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette = option.palette
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setClipRect(0, 0, option.rect.width(), option.rect.height())
+        if (layout := self.document.documentLayout()) is not None:
+            layout.draw(painter, context)
+        painter.restore()
+
+    def sizeHint(
+        self, option: QStyleOptionViewItem, index: QModelIndex
+    ) -> QSize:  # pylint: disable=invalid-name
+        # Every row is one line. Together with uniformItemSizes, the view never
+        # has to measure rows it doesn't show.
+        return QSize(0, option.fontMetrics.height() + 4)
+
+
+class History(QWidget):
+    def show(self) -> None:
+        super().show()
+        self.raise_()
+        self.view.scrollToBottom()
+
+    def __init__(self, parent: MainWindow):
+        super().__init__(parent)
+
+        self.setWindowFlags(Qt.WindowType.Window)
+        self.setWindowTitle("History")
+        self.setWindowIcon(get_icon())
+
+        screen = QApplication.primaryScreen()
+        if screen is None:
+            raise RuntimeError()
+        qrect = QStyle.alignedRect(
+            Qt.LayoutDirection.LayoutDirectionAuto,
+            Qt.AlignmentFlag.AlignCenter,
+            QSize(900, 600),
+            screen.availableGeometry(),
+        )
+        self.setGeometry(qrect)
+
+        self.history = EventHistory(parent.app.config["main"]["history_size"])
+        self.model = HistoryModel(self.history)
+
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search player, org or ship names")
+        self.search.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search.textChanged.connect(self.search_timer.start)
+
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(HtmlDelegate(self.view))
+        self.view.setUniformItemSizes(True)
+        self.view.setStyleSheet("font-family: Cascadia Code; font-size: 12px;")
+
+        self.status = QLabel()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.search)
+        layout.addWidget(self.view)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def add_event(self, data: Event | tuple[int, Event]):
+        if isinstance(data, tuple):
+            index, event = data
+            if index < 0:
+                seq = self.history.replace(index, event.type, event.marked)
+                if seq is not None:
+                    self.model.changed.add(seq)
+            else:
+                self.history.append(event.type, event.marked)
+        else:
+            self.history.append(data.type, data.marked)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar is None or scrollbar.value() == scrollbar.maximum()
+        self.model.flush()
+        if at_bottom:
+            self.view.scrollToBottom()
+        self.update_status()
+
+    def apply_search(self):
+        self.model.set_query(self.search.text())
+        self.view.scrollToBottom()
+        self.update_status()
+
+    def update_status(self):
+        if self.model.results is None:
+            self.status.setText(f"{len(self.history):,} events")
+        else:
+            self.status.setText(
+                f"{len(self.model.results):,} of {len(self.history):,} events"
+            )
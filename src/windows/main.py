@@ -6,8 +6,10 @@ from typing import TYPE_CHECKING
 from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QMainWindow
 
+from ..metrics import app_metrics
 from ..update import UpdateCheck
 from .about import About
+from .history import History
 from .options import Options
 from .overlay import Overlay
 from .tray_icon import TrayIcon
@@ -31,18 +33,31 @@ class MainWindow(QMainWindow):
 
         self.about = About(self)
         self.options = Options(self)
+        self.history = History(self)
 
-        self.overlay = Overlay(self)
+        self.overlay = Overlay(self, self.app.config)
         self.overlay.show()
 
         self.options.overlay_update_screen.connect(self.overlay.set_screen)
         self.options.overlay_update_position.connect(self.overlay.update_position)
         self.options.overlay_update_line_count.connect(self.overlay.update_line_count)
 
+        # Before the overlay, so a trace is delivered before it's painted
+        self.app.allslain.output.connect(self.app.allslain.tracer.delivered)
+        self.overlay.tracer = self.app.allslain.tracer
         self.app.allslain.output.connect(self.overlay.update_text)
+        self.app.allslain.event_output.connect(self.history.add_event)
 
         self.tray_icon = TrayIcon(self)
 
+        self.metrics = app_metrics(self)
+        if self.app.config["main"]["metrics_file"]:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(self.write_metrics)
+            self.metrics_timer.start(
+                max(1, self.app.config["main"]["metrics_interval"]) * 1000
+            )
+
         if __debug__:
             QTimer().singleShot(250, self.init_debug)
 
@@ -53,6 +68,12 @@ class MainWindow(QMainWindow):
         if self.app.config["main"]["check_updates"]:
             QTimer().singleShot(250, self.uc.start)
 
+    def write_metrics(self):
+        try:
+            self.metrics.write(self.app.config["main"]["metrics_file"])
+        except OSError as e:
+            logger.warning(f"failed to write metrics: {e}")
+
     def slot_reboot(self):
         logger.debug("Performing application reboot...")
         self.app.exit(MainWindow.EXIT_CODE_REBOOT)
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import TYPE_CHECKING, Callable, cast
 
 from allslain.data_providers.starcitizen_api import Mode as ScApiMode
-from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtCore import QSize, Qt, QTimer
 from PyQt6.QtCore import pyqtSignal as Signal
 from PyQt6.QtWidgets import (
     QApplication,
     QCheckBox,
     QComboBox,
+    QFileDialog,
     QFormLayout,
     QFrame,
     QGroupBox,
@@ -26,6 +28,9 @@ from ..allslain_patch import save_config as save_config_allslain
 from ..config import OverlayPosition, remove_nulls, save_config
 from ..discord import get_webhook
 from ..functions import get_icon
+from ..routing import DEFAULT_EVENTS
+from ..snapshot import PROVIDER_KEY as SNAPSHOT_KEY
+from ..snapshot import SnapshotImport, snapshot_info
 
 
 if TYPE_CHECKING:
@@ -40,6 +45,7 @@ DATA_PROVIDERS = {
     "Roberts Space Industries": "rsi",
     "Unofficial StarCitizen API": "starcitizen_api",
     "Wild Knight Squadron's NAVCOM API": "wks_navcom",
+    "Offline Snapshot": "snapshot",
 }
 
 DATA_PROVIDERS_HELPTEXT = {
@@ -47,6 +53,7 @@ DATA_PROVIDERS_HELPTEXT = {
     "rsi": "Roberts Space Industries",
     "starcitizen_api": "Unofficial Star Citizen API<br><b>Requires an API key!</b>",
     "wks_navcom": "Wild Knight Squadron's NAVCOM API",
+    "snapshot": "An imported org membership export, no internet needed",
 }
 
 DATA_PROVIDERS_HELPTEXTLINK = {
@@ -54,6 +61,7 @@ DATA_PROVIDERS_HELPTEXTLINK = {
     "rsi": '<a href="https://robertsspaceindustries.com/">https://robertsspaceindustries.com/</a>',
     "starcitizen_api": '<a href="https://starcitizen-api.com/">https://starcitizen-api.com/</a>',
     "wks_navcom": '<a href="https://sentry.wildknightsquadron.com/">https://sentry.wildknightsquadron.com/</a>',
+    "snapshot": "",
 }
 
 
@@ -205,6 +213,55 @@ class Options(QWidget):
         widget.setLayout(form)
         return widget
 
+    def create_widget_allslain_snapshot(self):
+        form = QFormLayout()
+
+        self.label_snapshot = QLabelDisabled(self.snapshot_text())
+        form.addRow(self.label_snapshot)
+
+        self.input_snapshot_import = QPushButton()
+        self.input_snapshot_import.setText("Import...")
+        self.input_snapshot_import.clicked.connect(self.import_snapshot)
+        form.addRow("CSV or JSON " + RED_ASTERISK, self.input_snapshot_import)
+        form.addRow(
+            QLabelDisabled(
+                "Columns: <b>handle</b>, <b>org</b> (SID) and optionally <b>org_name</b>."
+            )
+        )
+
+        widget = QGroupBox("Offline Snapshot")
+        widget.setLayout(form)
+        return widget
+
+    def snapshot_text(self) -> str:
+        if not (info := snapshot_info()):
+            return "No snapshot imported."
+        imported = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["imported"]))
+        return f"{info['rows']:,} players from {info['source']}, imported {imported}"
+
+    def import_snapshot(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import Snapshot",
+            filter="Snapshots (*.csv *.json *.jsonl);;All files (*)",
+        )
+        if not path:
+            return
+        self.input_snapshot_import.setEnabled(False)
+        self.snapshot_import = SnapshotImport(path)
+        self.snapshot_import.progress.connect(
+            lambda count: self.label_snapshot.setText(f"Importing... {count:,}")
+        )
+        self.snapshot_import.result.connect(self.snapshot_imported)
+        self.snapshot_import.start()
+
+    def snapshot_imported(self, result: int | str):
+        self.input_snapshot_import.setEnabled(True)
+        if isinstance(result, str):
+            self.label_snapshot.setText(f"Import failed: {result}")
+        else:
+            self.label_snapshot.setText(self.snapshot_text())
+
     def create_widget_allslain(self):
         form = QFormLayout()
 
@@ -221,12 +278,13 @@ class Options(QWidget):
         )
         form.addRow(hr())
 
+        current = (
+            SNAPSHOT_KEY
+            if self.config_gui["main"]["lookup_snapshot"]
+            else self.parent().app.allslain.args.data_provider.provider
+        )
         provider: tuple[str, str] = next(
-            (
-                (k, v)
-                for k, v in DATA_PROVIDERS.items()
-                if v == self.parent().app.allslain.args.data_provider.provider
-            ),
+            ((k, v) for k, v in DATA_PROVIDERS.items() if v == current),
             ("", ""),
         )
 
@@ -246,6 +304,22 @@ class Options(QWidget):
         form.addRow(self.label_dataprovider_link)
         form.addRow(hr())
 
+        input_lookup_auto = QCheckBox()
+        input_lookup_auto.setChecked(self.config_gui["main"]["lookup_auto"])
+        input_lookup_auto.clicked.connect(self.save_lookup_auto)
+        form.addRow("Auto Data Provider " + RED_ASTERISK, input_lookup_auto)
+        form.addRow(
+            QLabelDisabled(
+                "Use the fastest data provider, and ask a second one when it's slower than usual or down."
+            )
+        )
+        self.label_provider_stats = QLabelDisabled("")
+        form.addRow(self.label_provider_stats)
+        self.provider_stats_timer = QTimer(self)
+        self.provider_stats_timer.timeout.connect(self.update_provider_stats)
+        self.provider_stats_timer.start(1000)
+        form.addRow(hr())
+
         input_use_org_theme = QCheckBox()
         input_use_org_theme.setChecked(
             self.parent().app.allslain.args.data_provider.use_org_theme
@@ -264,6 +338,10 @@ class Options(QWidget):
         self.widget_uscapi.setEnabled(provider[1] == "starcitizen_api")
         form.addRow(self.widget_uscapi)
 
+        self.widget_snapshot = self.create_widget_allslain_snapshot()
+        self.widget_snapshot.setEnabled(provider[1] == SNAPSHOT_KEY)
+        form.addRow(self.widget_snapshot)
+
         widget = QWidget()
         widget.setLayout(form)
         return widget
@@ -290,10 +368,35 @@ class Options(QWidget):
         widget.setLayout(form)
         return widget
 
+    def create_widget_discord_webhooks(self):
+        form = QFormLayout()
+
+        for destination in self.config_gui["discord"]["webhooks"]:
+            filters = ", ".join(
+                [
+                    *(destination.get("events") or DEFAULT_EVENTS),
+                    *destination.get("players", []),
+                    *destination.get("orgs", []),
+                ]
+            )
+            label = QLabel(destination.get("name") or destination["url"])
+            label.setEnabled(destination.get("enabled", True))
+            form.addRow(label, QLabelDisabled(filters))
+        form.addRow(
+            QLabelDisabled(
+                "Configured under <b>[[discord.webhooks]]</b> in allslain_gui.conf.toml."
+            )
+        )
+
+        widget = QGroupBox("More Webhooks " + RED_ASTERISK)
+        widget.setLayout(form)
+        return widget
+
     def create_widget_discord(self):
         form = QFormLayout()
 
         form.addRow(self.create_widget_discord_webhook1())
+        form.addRow(self.create_widget_discord_webhooks())
 
         widget = QWidget()
         widget.setLayout(form)
@@ -337,10 +440,95 @@ class Options(QWidget):
         form.addRow(self.input_fake_update)
         form.addRow(hr())
 
+        self.label_overlay_stats = QLabelDisabled("")
+        form.addRow(QLabel("Overlay"), self.label_overlay_stats)
+
+        self.label_lookup_stats = QLabelDisabled("")
+        form.addRow(QLabel("Lookups"), self.label_lookup_stats)
+
+        self.label_lookup_cache_stats = QLabelDisabled("")
+        form.addRow(QLabel("Lookup Cache"), self.label_lookup_cache_stats)
+        form.addRow(hr())
+
+        tracer = self.parent().app.allslain.tracer
+        input_trace = QCheckBox()
+        input_trace.setChecked(tracer.enabled)
+        input_trace.clicked.connect(tracer.enable)
+        form.addRow("Trace Latency", input_trace)
+
+        self.label_trace_stats = QLabelDisabled("")
+        form.addRow(QLabel("Latency"), self.label_trace_stats)
+        form.addRow(hr())
+
+        self.label_metrics = QLabelDisabled("")
+        form.addRow(QLabel("Metrics"), self.label_metrics)
+        form.addRow(hr())
+
+        input_profile = QCheckBox()
+        input_profile.setChecked(self.parent().app.profiler.running)
+        input_profile.clicked.connect(self.toggle_profiler)
+        form.addRow("Profile", input_profile)
+
+        self.label_profile = QLabelDisabled("")
+        form.addRow(self.label_profile)
+
+        input_trace_reset = QPushButton("Reset")
+        input_trace_reset.clicked.connect(tracer.reset)
+        input_trace_save = QPushButton("Save JSON...")
+        input_trace_save.clicked.connect(self.save_trace)
+        form.addRow(input_trace_reset, input_trace_save)
+
+        self.debug_timer = QTimer(self)
+        self.debug_timer.timeout.connect(self.update_debug_stats)
+        self.debug_timer.start(1000)
+
         widget = QWidget()
         widget.setLayout(form)
         return widget
 
+    def toggle_profiler(self, enabled: bool):
+        app = self.parent().app
+        if enabled:
+            app.profiler.start()
+            self.label_profile.setText("Profiling...")
+        elif paths := app.stop_profiler():
+            self.label_profile.setText("Saved<br>" + "<br>".join(paths))
+        else:
+            self.label_profile.setText("")
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Latency Trace", "latency.json", filter="JSON (*.json)"
+        )
+        if not path:
+            return
+        try:
+            self.parent().app.allslain.tracer.dump(path)
+        except OSError as e:
+            logger.warning(f"failed to save latency trace: {e}")
+
+    def update_provider_stats(self):
+        if not self.isVisible():
+            return
+        if hedged := self.parent().app.allslain.hedged:
+            self.label_provider_stats.setText(str(hedged).replace("\n", "<br>"))
+
+    def update_debug_stats(self):
+        if not self.isVisible():
+            return
+        self.label_overlay_stats.setText(self.parent().overlay.stats)
+        if lookup := self.parent().app.allslain.lookup:
+            self.label_lookup_stats.setText(lookup.stats)
+            if cache := lookup.cache:
+                self.label_lookup_cache_stats.setText(cache.stats)
+        metrics = self.parent().metrics
+        self.label_metrics.setText(
+            metrics.text(metrics.collect("debug")).replace("\n", "<br>")
+        )
+        tracer = self.parent().app.allslain.tracer
+        if tracer.enabled:
+            self.label_trace_stats.setText(str(tracer).replace("\n", "<br>"))
+
     def save_overlay_screen(self, screen: str):
         logger.debug("saving overlay screen")
         self.config_gui["main"]["screen"] = screen
@@ -375,6 +563,7 @@ class Options(QWidget):
         # Requires a restart
         dp = DATA_PROVIDERS.get(text, text)
         self.widget_uscapi.setEnabled(dp == "starcitizen_api")
+        self.widget_snapshot.setEnabled(dp == SNAPSHOT_KEY)
 
         # try:
         #     # This destroys the C Qt objects too?
@@ -386,8 +575,18 @@ class Options(QWidget):
         self.label_dataprovider.setText(DATA_PROVIDERS_HELPTEXT.get(dp))
         self.label_dataprovider_link.setText(DATA_PROVIDERS_HELPTEXTLINK.get(dp))
 
-        self.config_als["data_provider"]["provider"] = dp
-        save_config_allslain(self.config_als)
+        # allslain doesn't know the snapshot, so it's kept in the GUI's config
+        snapshot = dp == SNAPSHOT_KEY
+        if snapshot != self.config_gui["main"]["lookup_snapshot"]:
+            self.config_gui["main"]["lookup_snapshot"] = snapshot
+            save_config(self.config_gui)
+        if not snapshot:
+            self.config_als["data_provider"]["provider"] = dp
+            save_config_allslain(self.config_als)
+
+    def save_lookup_auto(self, lookup_auto: bool):
+        self.config_gui["main"]["lookup_auto"] = lookup_auto
+        save_config(self.config_gui)
 
     def save_org_theme(self, use_org_theme: bool):
         self.config_als["data_provider"]["use_org_theme"] = use_org_theme
@@ -1,44 +1,65 @@
 from __future__ import annotations
 
 import logging
+import sys
 from collections import deque
 from typing import TYPE_CHECKING
 
-import win32con
-import win32gui
 from allslain.version import VersionCheckResult
-from PyQt6.QtCore import QSize, Qt
-from PyQt6.QtGui import QColor
-from PyQt6.QtWidgets import (
-    QApplication,
-    QGraphicsDropShadowEffect,
-    QLabel,
-    QStyle,
-    QVBoxLayout,
-    QWidget,
-)
+from PyQt6.QtCore import QSize, Qt, QTimer
+from PyQt6.QtWidgets import QApplication, QStyle, QVBoxLayout, QWidget
+
+from .overlay_text import OverlayText
 
 
 if TYPE_CHECKING:
-    from ..app import MainWindow
+    from ..config import ConfigDocument
+    from ..tracing import Tracer
 
 
 logger = logging.getLogger("all-slain-gui").getChild("overlay")
 
 
+# Used when the screen doesn't report its refresh rate
+REFRESH_RATE_DEFAULT = 60.0
+
+
 class Overlay(QWidget):
-    def __init__(self, mw: MainWindow):
-        super().__init__(mw)
+    def __init__(self, parent: QWidget | None, config: ConfigDocument):
+        super().__init__(parent)
 
-        self.config_gui = mw.options.parent().app.config
+        self.config_gui = config
 
         self.alignment = Qt.AlignmentFlag.AlignLeft
         if self.config_gui["main"]["overlay_position"] == "bottom":
             self.alignment |= Qt.AlignmentFlag.AlignBottom
         else:
             self.alignment |= Qt.AlignmentFlag.AlignTop
+        self.refresh_interval = 0
         self.set_screen()
 
+        # Lines are applied as they arrive, the label is repainted at most once
+        # per refresh interval.
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.repaint_timer.timeout.connect(self.flush)
+        self._dirty = False
+        # Lines added since the last repaint
+        self._unpainted = 0
+        self.repaints = 0
+        # Updates that shared a repaint with an earlier one
+        self.merged = 0
+        # Lines that scrolled off before they were ever shown
+        self.dropped = 0
+        self.tracer: Tracer | None = None
+        # Lines appended so far, from AllSlain or not
+        self.seq = 0
+        # seqs of AllSlain's lines still shown, oldest first. AllSlain counts
+        # back from its own last line, which the lines it doesn't know about
+        # can follow.
+        self.allslain_seqs: deque[int] = deque()
+
         self.setWindowFlags(
             Qt.WindowType.WindowStaysOnTopHint
             | Qt.WindowType.FramelessWindowHint
@@ -46,7 +67,7 @@ class Overlay(QWidget):
         )
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
 
-        self.text = QLabel(self)
+        self.text = OverlayText(self)
         if self.config_gui["main"]["overlay_position"] == "bottom":
             self.text.setAlignment(
                 Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignBottom
@@ -56,24 +77,6 @@ class Overlay(QWidget):
                 Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop
             )
 
-        effect = QGraphicsDropShadowEffect(self)
-        effect.setBlurRadius(0)
-        effect.setColor(QColor("#222222"))
-        effect.setOffset(1, 1)
-        self.text.setGraphicsEffect(effect)
-
-        stylesheet = (
-            "background-color: transparent;"
-            "border: none;"
-            "font-family: Cascadia Code;"
-            "font-size: 12px;"
-            "text-align: top;"
-            # "padding-top: 0px;"
-            "margin-left: 1px;"
-        )
-        # if __debug__:
-        #     stylesheet += "background-color: blue;"
-        self.text.setStyleSheet(stylesheet)
         self.lines = deque(
             [
                 '<span style="color:white;">all-slain: Star Citizen Game Log Reader</span>',
@@ -83,11 +86,7 @@ class Overlay(QWidget):
         )
         for _ in range(self.config_gui["main"]["line_count"] - len(self.lines)):
             self.lines.appendleft("")
-        self.text.setText("<br>".join(self.lines))
-        self.text.setTextInteractionFlags(
-            Qt.TextInteractionFlag.LinksAccessibleByMouse
-        )  # default
-        self.text.setOpenExternalLinks(True)
+        self.text.set_lines(self.lines)
         self.text.show()
 
         layout = QVBoxLayout()
@@ -96,24 +95,78 @@ class Overlay(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
 
-        win32gui.SetWindowLong(
-            int(self.winId()),
-            win32con.GWL_EXSTYLE,
-            win32con.WS_EX_NOACTIVATE,
-        )
+        if sys.platform == "win32":
+            import win32con
+            import win32gui
+
+            win32gui.SetWindowLong(
+                int(self.winId()),
+                win32con.GWL_EXSTYLE,
+                win32con.WS_EX_NOACTIVATE,
+            )
 
     def update_text(self, line: str | tuple[int, str]):
+        """
+        AllSlain's output
+        """
         if isinstance(line, tuple):
-            if line[0] == -1:
-                self.lines.pop()
-            else:
-                # 0
-                self.lines.popleft()
-            self.lines.append(line[1])
-        else:
-            self.lines.popleft()
-            self.lines.append(line)
-        self.text.setText("<br>".join(self.lines))
+            index, text = line
+            if index < 0:
+                # Counting back from AllSlain's last line, which is -1
+                if -index > len(self.allslain_seqs):
+                    return
+                self.lines[self.allslain_seqs[index] - self.seq] = text
+                self.schedule_repaint()
+                return
+            # 0
+            line = text
+        self.append_line(line)
+        self.allslain_seqs.append(self.seq - 1)
+
+    def append_line(self, text: str):
+        self.lines.popleft()
+        self.lines.append(text)
+        self.seq += 1
+        self._unpainted += 1
+        # Scrolled off
+        while self.allslain_seqs and self.allslain_seqs[0] < self.seq - len(self.lines):
+            self.allslain_seqs.popleft()
+        self.schedule_repaint()
+
+    def schedule_repaint(self):
+        if not self.config_gui["main"]["overlay_coalesce"]:
+            self.repaint_text()
+            return
+        if self.repaint_timer.isActive():
+            if self._dirty:
+                self.merged += 1
+            self._dirty = True
+            return
+        # Nothing painted recently, so paint now and hold off the next
+        self.repaint_text()
+        self.repaint_timer.start(self.refresh_interval)
+
+    def flush(self):
+        if not self._dirty:
+            return
+        self.repaint_text()
+        self.repaint_timer.start(self.refresh_interval)
+
+    def repaint_text(self):
+        self.dropped += max(0, self._unpainted - len(self.lines))
+        self._unpainted = 0
+        self._dirty = False
+        self.repaints += 1
+        self.text.set_lines(self.lines)
+        if self.tracer is not None and self.tracer.enabled:
+            self.tracer.painted()
+
+    @property
+    def stats(self) -> str:
+        return (
+            f"repaints={self.repaints} merged={self.merged} dropped={self.dropped}"
+            f" lines rendered={self.text.rendered}"
+        )
 
     def update_position(self, pos_name: str):
         logger.debug(f"overlay pos {pos_name}")
@@ -142,19 +195,27 @@ class Overlay(QWidget):
             geometry,
         )
         self.setGeometry(qrect)
+        refresh_hz = (
+            self.config_gui["main"]["overlay_refresh_hz"]
+            or screen.refreshRate()
+            or REFRESH_RATE_DEFAULT
+        )
+        self.refresh_interval = max(1, round(1000 / refresh_hz))
         if layout := self.layout():
             layout.setAlignment(self.alignment)
 
     def update_line_count(self, lines: int):
         while len(self.lines) > lines:
             self.lines.popleft()
+        while self.allslain_seqs and self.allslain_seqs[0] < self.seq - lines:
+            self.allslain_seqs.popleft()
         while len(self.lines) < lines:
             self.lines.appendleft("")
-        self.text.setText("<br>".join(self.lines))
+        self.schedule_repaint()
 
     def add_message_update_available(self, result: VersionCheckResult):
         if result.error is None:
-            self.update_text(
+            self.append_line(
                 f'<span style="color: cyan">An update is available:</span> '
                 f'<a style="color:#1050FF; text-decoration: none;" href="{result.url}">v{result.version}</a>'
             )
@@ -0,0 +1,173 @@
+"""
+
+Overlay text, painted from a cached image per line
+
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable
+
+from PyQt6.QtCore import QPoint, QPointF, QSize, Qt, QUrl
+from PyQt6.QtGui import (
+    QAbstractTextDocumentLayout,
+    QColor,
+    QDesktopServices,
+    QFont,
+    QImage,
+    QMouseEvent,
+    QPainter,
+    QPaintEvent,
+    QPixmap,
+    QTextDocument,
+)
+from PyQt6.QtWidgets import QWidget
+
+
+FONT_FAMILY = "Cascadia Code"
+FONT_PIXEL_SIZE = 12
+
+SHADOW_COLOR = QColor("#222222")
+SHADOW_OFFSET = QPoint(1, 1)
+MARGIN_LEFT = 1
+
+# Rendered lines kept around. Lines come back when the line count changes, or
+# when a (-1, text) update goes back to an earlier text.
+LINE_CACHE_SIZE = 32
+
+
+class RenderedLine:
+    def __init__(self, html: str, document: QTextDocument, pixmap: QPixmap):
+        self.html = html
+        # Kept for link hit testing
+        self.document = document
+        self.pixmap = pixmap
+
+    @property
+    def width(self) -> int:
+        return round(self.pixmap.width() / self.pixmap.devicePixelRatio())
+
+    @property
+    def height(self) -> int:
+        return round(self.pixmap.height() / self.pixmap.devicePixelRatio())
+
+
+class OverlayText(QWidget):
+    """
+    A replacement for a QLabel showing lines joined by <br>. Each line is laid out
+    and drawn with its shadow once, a repaint only copies the images.
+    """
+
+    def __init__(self, parent: QWidget | None = None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setMouseTracking(True)
+        self.alignment = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop
+        self.font_ = QFont(FONT_FAMILY)
+        self.font_.setPixelSize(FONT_PIXEL_SIZE)
+        self.lines: list[RenderedLine] = []
+        self.cache: OrderedDict[str, RenderedLine] = OrderedDict()
+        self.rendered = 0
+
+    def setAlignment(self, alignment: Qt.AlignmentFlag):  # pylint: disable=invalid-name
+        self.alignment = alignment
+        self.update()
+
+    def set_lines(self, lines: Iterable[str]) -> None:
+        self.lines = [self.render_line(html) for html in lines]
+        self.updateGeometry()
+        self.update()
+
+    def render_line(self, html: str) -> RenderedLine:
+        try:
+            line = self.cache[html]
+        except KeyError:
+            pass
+        else:
+            self.cache.move_to_end(html)
+            return line
+
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.font_)
+        document.setHtml(html)
+
+        ratio = self.devicePixelRatioF()
+        size = document.size().toSize() + QSize(
+            MARGIN_LEFT + SHADOW_OFFSET.x(), SHADOW_OFFSET.y()
+        )
+        text = QImage(size * ratio, QImage.Format.Format_ARGB32_Premultiplied)
+        text.setDevicePixelRatio(ratio)
+        text.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(text)
+        painter.translate(MARGIN_LEFT, 0)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette = self.palette()
+        if (layout := document.documentLayout()) is not None:
+            layout.draw(painter, context)
+        painter.end()
+
+        shadow = QImage(text)
+        painter = QPainter(shadow)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
+        painter.fillRect(shadow.rect(), SHADOW_COLOR)
+        painter.end()
+
+        image = QImage(text.size(), QImage.Format.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(ratio)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        painter.drawImage(SHADOW_OFFSET, shadow)
+        painter.drawImage(0, 0, text)
+        painter.end()
+
+        line = RenderedLine(html, document, QPixmap.fromImage(image))
+        self.rendered += 1
+        self.cache[html] = line
+        if len(self.cache) > LINE_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return line
+
+    def sizeHint(self) -> QSize:  # pylint: disable=invalid-name
+        return QSize(
+            max((line.width for line in self.lines), default=0),
+            sum(line.height for line in self.lines),
+        )
+
+    def top(self) -> int:
+        if self.alignment & Qt.AlignmentFlag.AlignBottom:
+            return self.height() - sum(line.height for line in self.lines)
+        return 0
+
+    def paintEvent(self, a0: QPaintEvent | None):  # pylint: disable=invalid-name
+        painter = QPainter(self)
+        y = self.top()
+        for line in self.lines:
+            painter.drawPixmap(0, y, line.pixmap)
+            y += line.height
+        painter.end()
+
+    def anchor_at(self, pos: QPointF) -> str:
+        y = pos.y() - self.top()
+        for line in self.lines:
+            if 0 <= y < line.height:
+                if (layout := line.document.documentLayout()) is None:
+                    return ""
+                return layout.anchorAt(QPointF(pos.x() - MARGIN_LEFT, y))
+            y -= line.height
+        return ""
+
+    def mouseMoveEvent(self, a0: QMouseEvent | None):  # pylint: disable=invalid-name
+        if a0 is None:
+            return
+        if self.anchor_at(a0.position()):
+            self.setCursor(Qt.CursorShape.PointingHandCursor)
+        else:
+            self.unsetCursor()
+
+    def mouseReleaseEvent(self, a0: QMouseEvent | None):  # pylint: disable=invalid-name
+        if a0 is None or a0.button() != Qt.MouseButton.LeftButton:
+            return
+        if href := self.anchor_at(a0.position()):
+            QDesktopServices.openUrl(QUrl(href))
@@ -37,6 +37,10 @@ class TrayIcon(QSystemTrayIcon):
         self.action_update.setVisible(False)
         self.menu.addAction(self.action_update)
 
+        self.action_history = QAction("History")
+        self.action_history.triggered.connect(self.parent().history.show)
+        self.menu.addAction(self.action_history)
+
         self.action_options = QAction("Options")
         self.action_options.triggered.connect(self.parent().options.show)
         self.menu.addAction(self.action_options)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+
+class StandIn:
+    """
+    A local HTTP server that answers with scripted responses, for webhooks and
+    data providers.
+    """
+
+    def __init__(self):
+        # (status, headers, body, delay)
+        self.responses: deque[tuple[int, dict[str, str], bytes, float]] = deque()
+        self.default: tuple[int, dict[str, str], bytes, float] = (200, {}, b"{}", 0.0)
+        # Body and the status answered
+        self.requests: list[tuple[bytes, int]] = []
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_request(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                with stand_in.lock:
+                    response = (
+                        stand_in.responses.popleft()
+                        if stand_in.responses
+                        else stand_in.default
+                    )
+                    stand_in.requests.append((body, response[0]))
+                status, headers, content, delay = response
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = handle_request
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}/"
+
+    def respond(
+        self,
+        status: int = 200,
+        body: object = None,
+        headers: dict[str, str] | None = None,
+        delay: float = 0.0,
+        times: int = 1,
+    ) -> None:
+        """
+        Queues the next responses. Once they're used up, the default is sent.
+        """
+        content = json.dumps(body if body is not None else {}).encode()
+        with self.lock:
+            for _ in range(times):
+                self.responses.append((status, headers or {}, content, delay))
+
+    def received(self, delivered: bool = False) -> list[dict]:
+        """
+        Request bodies, only those answered with success if `delivered`.
+        """
+        with self.lock:
+            return [
+                json.loads(body)
+                for body, status in self.requests
+                if body and (not delivered or status < 300)
+            ]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in() -> Iterator[StandIn]:
+    server = StandIn()
+    yield server
+    server.close()
+
+
+def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import time
+from functools import partial
+
+import pytest
+
+from src import discord
+from src.discord import WebhookDispatcher
+from src.outbox import Outbox
+
+from .conftest import StandIn, wait_for
+
+
+@pytest.fixture
+def outbox_path(tmp_path, monkeypatch) -> str:
+    path = str(tmp_path / "outbox.sqlite3")
+    monkeypatch.setattr(discord, "Outbox", partial(Outbox, path=path))
+    return path
+
+
+def sent_texts(stand_in: StandIn) -> list[str]:
+    texts = []
+    for body in stand_in.received(delivered=True):
+        content = body["content"]
+        assert content.startswith(discord.MESSAGE_PREFIX)
+        assert content.endswith(discord.MESSAGE_SUFFIX)
+        texts.extend(
+            content[len(discord.MESSAGE_PREFIX) : -len(discord.MESSAGE_SUFFIX)].split(
+                "\n"
+            )
+        )
+    return texts
+
+
+def test_backoff_doubles_on_server_errors(stand_in: StandIn, outbox_path: str):
+    dispatcher = WebhookDispatcher(stand_in.url)
+    outbox = Outbox(stand_in.url, outbox_path)
+    outbox.add(["kill"])
+    stand_in.respond(500, times=2)
+
+    start = time.monotonic()
+    dispatcher.send(outbox)
+    assert dispatcher._blocked_until - start == pytest.approx(
+        discord.BACKOFF_MIN, abs=0.5
+    )
+    dispatcher.send(outbox)
+    assert dispatcher._blocked_until - start == pytest.approx(
+        2 * discord.BACKOFF_MIN, abs=0.5
+    )
+
+    assert dispatcher.failed == 2
+    assert outbox.pending == 1
+    assert outbox.db.execute("SELECT attempts FROM outbox").fetchone() == (2,)
+
+    # Recovered
+    dispatcher.send(outbox)
+    assert outbox.pending == 0
+    assert dispatcher._failures == 0
+    assert len(stand_in.requests) == 3
+    assert sent_texts(stand_in) == ["kill"]
+    outbox.close()
+
+
+def test_backoff_on_connection_errors(stand_in: StandIn, outbox_path: str):
+    url = stand_in.url
+    stand_in.close()
+    dispatcher = WebhookDispatcher(url)
+    outbox = Outbox(url, outbox_path)
+    outbox.add(["kill"])
+
+    start = time.monotonic()
+    dispatcher.send(outbox)
+    assert dispatcher.failed == 1
+    assert dispatcher._blocked_until > start
+    assert outbox.pending == 1
+    outbox.close()
+
+
+@pytest.mark.parametrize(
+    "headers, body",
+    [({"Retry-After": "3"}, {}), ({}, {"retry_after": 3})],
+)
+def test_rate_limited(stand_in: StandIn, outbox_path: str, headers, body):
+    dispatcher = WebhookDispatcher(stand_in.url)
+    outbox = Outbox(stand_in.url, outbox_path)
+    outbox.add(["kill"])
+    stand_in.respond(429, body, headers)
+
+    start = time.monotonic()
+    dispatcher.send(outbox)
+    assert dispatcher._blocked_until - start == pytest.approx(3, abs=0.5)
+    # Not a failure, and not backed off any further
+    assert dispatcher.failed == 0
+    assert dispatcher._failures == 0
+    assert outbox.pending == 1
+    outbox.close()
+
+
+def test_rows_kept_across_restart(stand_in: StandIn, outbox_path: str):
+    outbox = Outbox(stand_in.url, outbox_path)
+    outbox.add(["first", "second"])
+    outbox.close()
+
+    outbox = Outbox(stand_in.url, outbox_path)
+    assert outbox.pending == 2
+    assert [row[1] for row in outbox.next(10)] == ["first", "second"]
+    # Only this webhook's
+    other = Outbox("http://127.0.0.1:1/", outbox_path)
+    assert other.pending == 0
+    other.close()
+    outbox.close()
+
+
+def test_queued_messages_stored_on_stop(stand_in: StandIn, outbox_path: str):
+    url = stand_in.url
+    stand_in.close()
+    dispatcher = WebhookDispatcher(url)
+    dispatcher.start()
+    for i in range(5):
+        dispatcher.post(f"kill {i}")
+    dispatcher.stop()
+    assert dispatcher.wait(10_000)
+
+    outbox = Outbox(url, outbox_path)
+    assert [row[1] for row in outbox.next(10)] == [f"kill {i}" for i in range(5)]
+    outbox.close()
+
+
+def test_at_least_once_through_outage(stand_in: StandIn, outbox_path: str, monkeypatch):
+    monkeypatch.setattr(discord, "BACKOFF_MIN", 0.01)
+    stand_in.respond(500, times=2)
+    stand_in.respond(429, headers={"Retry-After": "0.05"})
+    stand_in.respond(503)
+
+    dispatcher = WebhookDispatcher(stand_in.url)
+    dispatcher.start()
+    texts = [f"kill {i}" for i in range(20)]
+    for text in texts:
+        dispatcher.post(text)
+    try:
+        assert wait_for(lambda: set(texts) <= set(sent_texts(stand_in)))
+    finally:
+        dispatcher.stop()
+        assert dispatcher.wait(10_000)
+
+    outbox = Outbox(stand_in.url, outbox_path)
+    assert outbox.pending == 0
+    outbox.close()
+
+
+def test_delivered_after_restart(stand_in: StandIn, outbox_path: str):
+    # Down for the whole first session
+    stand_in.default = (500, {}, b"{}", 0.0)
+    dispatcher = WebhookDispatcher(stand_in.url)
+    dispatcher.start()
+    dispatcher.post("kill")
+    assert wait_for(lambda: stand_in.requests)
+    assert not sent_texts(stand_in)
+    dispatcher.stop()
+    assert dispatcher.wait(10_000)
+
+    stand_in.default = (200, {}, b"{}", 0.0)
+    dispatcher = WebhookDispatcher(stand_in.url)
+    dispatcher.start()
+    try:
+        assert wait_for(lambda: sent_texts(stand_in) == ["kill"])
+    finally:
+        dispatcher.stop()
+        assert dispatcher.wait(10_000)
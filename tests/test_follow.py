@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pytest
+
+from src import follow
+from src.follow import LogFollower
+
+
+def read_all(path, chunked: bool) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        follower = LogFollower(
+            f, "\n", lambda: False, chunked=chunked, stop_at_eof=True
+        )
+        try:
+            return list(follower)
+        finally:
+            follower.close()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"a\r\nb\r\nc\r\n",
+        b"a\nb\nc\n",
+        b"a\r\nb\nc\r\n",
+        b"a\r\nb\r\nc",
+        b"\r\n\r\nplayer \xc3\xa9\r\n",
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, follow.CHUNK_SIZE])
+def test_chunked_matches_readline(tmp_path, monkeypatch, data: bytes, chunk_size):
+    monkeypatch.setattr(follow, "CHUNK_SIZE", chunk_size)
+    path = tmp_path / "Game.log"
+    path.write_bytes(data)
+
+    lines = read_all(path, chunked=False)
+    assert lines == data.decode().replace("\r\n", "\n").removesuffix("\n").split("\n")
+    assert read_all(path, chunked=True) == lines
+
+
+@pytest.mark.parametrize("old", [b"a\nb\n", b"a\nb"])
+@pytest.mark.parametrize("chunked", [False, True])
+def test_replaced(tmp_path, old: bytes, chunked: bool):
+    path = tmp_path / "Game.log"
+    path.write_bytes(old)
+    replaced = False
+
+    def idle() -> bool:
+        nonlocal replaced
+        if not replaced:
+            replaced = True
+            path.rename(tmp_path / "Game.old.log")
+            path.write_bytes(b"c\n")
+        return True
+
+    lines = []
+    with open(path, encoding="utf-8") as f:
+        follower = LogFollower(f, "\n", lambda: "c" in lines, idle, chunked=chunked)
+        for line in follower:
+            lines.append(line)
+        follower.close()
+    assert lines == ["a", "b", "c"]
+    assert follower.reopened == 1
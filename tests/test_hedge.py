@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Iterator
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from src import hedge
+from src.hedge import HedgedLookup
+
+from .conftest import StandIn
+
+
+@pytest.fixture
+def backup() -> Iterator[StandIn]:
+    server = StandIn()
+    yield server
+    server.close()
+
+
+def provider(stand_in: StandIn):
+    def lookup_player(name: str):
+        with urlopen(f"{stand_in.url}{name}", timeout=10) as response:
+            return json.load(response)
+
+    return lookup_player
+
+
+def hedged(primary: StandIn, backup: StandIn) -> HedgedLookup:
+    lookup = HedgedLookup({"primary": provider(primary), "backup": provider(backup)})
+    # The primary measured as the faster, so it's asked first
+    for _ in range(hedge.MIN_SAMPLES):
+        lookup.stats["primary"].record(0.1)
+        lookup.stats["backup"].record(0.2)
+    return lookup
+
+
+def test_hedges_after_p90(stand_in: StandIn, backup: StandIn):
+    lookup = hedged(stand_in, backup)
+    stand_in.respond(body={"from": "primary"}, delay=2)
+    backup.respond(body={"from": "backup"})
+
+    start = time.monotonic()
+    assert lookup("someone") == {"from": "backup"}
+    elapsed = time.monotonic() - start
+    assert 0.1 <= elapsed < 1
+    assert lookup.hedged == 1
+    assert len(stand_in.requests) == 1
+    assert len(backup.requests) == 1
+    assert lookup.stats["backup"].wins == 1
+
+
+def test_not_hedged_within_p90(stand_in: StandIn, backup: StandIn):
+    lookup = hedged(stand_in, backup)
+    stand_in.respond(body={"from": "primary"})
+
+    assert lookup("someone") == {"from": "primary"}
+    assert lookup.hedged == 0
+    assert not backup.requests
+
+
+def test_first_answer_wins(stand_in: StandIn, backup: StandIn):
+    lookup = hedged(stand_in, backup)
+    # Hedged, then the primary answers first anyway
+    stand_in.respond(body={"from": "primary"}, delay=0.3)
+    backup.respond(body={"from": "backup"}, delay=2)
+
+    start = time.monotonic()
+    assert lookup("someone") == {"from": "primary"}
+    assert time.monotonic() - start < 1
+    assert lookup.hedged == 1
+    assert len(backup.requests) == 1
+    assert lookup.stats["primary"].wins == 1
+    assert lookup.stats["backup"].wins == 0
+
+
+def test_failover_on_error(stand_in: StandIn, backup: StandIn, monkeypatch):
+    monkeypatch.setattr(hedge, "HEDGE_DELAY_DEFAULT", 5.0)
+    lookup = HedgedLookup({"primary": provider(stand_in), "backup": provider(backup)})
+    stand_in.respond(500)
+    backup.respond(body={"from": "backup"})
+
+    start = time.monotonic()
+    assert lookup("someone") == {"from": "backup"}
+    # Asked straight away, not after the hedge delay
+    assert time.monotonic() - start < 1
+    assert lookup.hedged == 0
+    assert lookup.stats["primary"].errors == {HTTPError.__name__: 1}
+    assert lookup.stats["primary"].failures_in_row == 1
+
+
+def test_every_provider_failing(stand_in: StandIn, backup: StandIn):
+    lookup = hedged(stand_in, backup)
+    stand_in.respond(500)
+    backup.respond(503)
+
+    with pytest.raises(HTTPError):
+        lookup("someone")
+
+
+def test_down_after_failures(stand_in: StandIn, backup: StandIn):
+    lookup = hedged(stand_in, backup)
+    stand_in.default = (500, {}, b"{}", 0.0)
+
+    for _ in range(hedge.FAILURES_DOWN):
+        assert lookup("someone") == {}
+    assert not lookup.stats["primary"].healthy
+    assert lookup.ordered() == ["backup", "primary"]
+
+    # Skipped while it's down
+    assert lookup("someone") == {}
+    assert len(stand_in.requests) == hedge.FAILURES_DOWN
+    assert len(backup.requests) == hedge.FAILURES_DOWN + 1
+
+
+def test_up_again_after_down_time(stand_in: StandIn, backup: StandIn, monkeypatch):
+    monkeypatch.setattr(hedge, "DOWN_TIME", 0)
+    lookup = hedged(stand_in, backup)
+    stand_in.respond(500, times=hedge.FAILURES_DOWN)
+
+    for _ in range(hedge.FAILURES_DOWN):
+        lookup("someone")
+    assert lookup.stats["primary"].healthy
+    stand_in.respond(body={"from": "primary"})
+    assert lookup("someone") == {"from": "primary"}
+    assert lookup.stats["primary"].failures_in_row == 0
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import time
+from itertools import pairwise
+from typing import Iterator
+
+import pytest
+
+from src import process
+from src.process import ProcessWatcher
+from src.synthetic import start_stand_in
+
+
+@pytest.fixture
+def exe() -> str:
+    # Short enough that the kernel doesn't cut the process name off
+    return f"sc{os.getpid()}.exe"
+
+
+@pytest.fixture
+def game(tmp_path, exe: str) -> Iterator[subprocess.Popen]:
+    proc = start_stand_in(str(tmp_path), exe)
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_scans_back_off(exe: str):
+    watcher = ProcessWatcher(exe)
+    # Seconds slept after each scan
+    slept: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        if len(slept) < watcher.scans:
+            slept.append(0.0)
+        slept[-1] += seconds
+        assert seconds <= process.STOP_CHECK_INTERVAL
+
+    assert watcher.wait_started(lambda: watcher.scans >= 8, sleep) is None
+    assert watcher.scans == 8
+    assert slept[0] == pytest.approx(process.SCAN_INTERVAL_MIN)
+    for before, after in pairwise(slept):
+        assert after == pytest.approx(
+            min(before * process.SCAN_BACKOFF, process.SCAN_INTERVAL_MAX),
+            abs=process.STOP_CHECK_INTERVAL,
+        )
+    assert max(slept) == pytest.approx(
+        process.SCAN_INTERVAL_MAX, abs=process.STOP_CHECK_INTERVAL
+    )
+    assert not watcher.running
+
+
+def test_stops_while_waiting(exe: str):
+    watcher = ProcessWatcher(exe)
+    sleeps = 0
+
+    def sleep(seconds: float) -> None:
+        nonlocal sleeps
+        sleeps += 1
+
+    assert watcher.wait_started(lambda: sleeps >= 2, sleep) is None
+    assert watcher.scans == 1
+
+
+def test_finds_process(game: subprocess.Popen, exe: str):
+    watcher = ProcessWatcher(exe)
+    proc = watcher.wait_started(lambda: False, time.sleep)
+    assert proc is not None
+    assert proc.pid == game.pid
+    assert watcher.exe is not None
+    assert os.path.basename(watcher.exe) == exe
+    assert watcher.running
+    assert not watcher.exited.is_set()
+
+
+def test_finds_process_started_later(tmp_path, exe: str):
+    watcher = ProcessWatcher(exe)
+    started: list[subprocess.Popen] = []
+
+    def sleep(seconds: float) -> None:
+        if not started:
+            started.append(start_stand_in(str(tmp_path), exe))
+        time.sleep(0.01)
+
+    try:
+        proc = watcher.wait_started(lambda: watcher.scans >= 20, sleep)
+        assert proc is not None
+        assert proc.pid == started[0].pid
+        assert watcher.scans >= 2
+    finally:
+        for game in started:
+            game.kill()
+            game.wait()
+
+
+def test_exited_when_killed(game: subprocess.Popen, exe: str):
+    watcher = ProcessWatcher(exe)
+    assert watcher.wait_started(lambda: False, time.sleep) is not None
+
+    game.kill()
+    game.wait()
+    assert watcher.exited.wait(10)
+    assert not watcher.running